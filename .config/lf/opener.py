@@ -8,7 +8,7 @@ from os.path import basename, expanduser, isfile, join
 from subprocess import DEVNULL, Popen, run
 from sys import argv
 
-from my_utils.iters import flatmap, is_empty, star_foreach
+from my_utils.iters import flatmap, is_empty, race_fallback, star_foreach
 from my_utils.os import get_mime_type
 from xdg import BaseDirectory
 
@@ -96,7 +96,7 @@ def get_default_desktops(mime_type: str, interactive=False):
                 start = i + 21
             return desktop_names
 
-        if xdg_current_desktop[0] == "kde":
+        def extract_from_ktrader():
             raw_info = run(
                 ["ktraderclient5", "--mimetype", mime_type],
                 check=True,
@@ -110,9 +110,15 @@ def get_default_desktops(mime_type: str, interactive=False):
             if not is_empty(desktop_names):
                 return desktop_names if interactive else desktop_names[0]
             else:
-                return extract_from_mimelist()
-        else:
-            return extract_from_mimelist()
+                return None
+
+        desktop = (
+            # the query is slow, so read mimeapps lists while waiting for it
+            race_fallback(extract_from_ktrader, extract_from_mimelist)
+            if xdg_current_desktop[0] == "kde"
+            else extract_from_mimelist()
+        )
+        return fallback_to_text_editor() if desktop is None else desktop
 
     def extract_from_mimelist():
         def make_get_desktop_name():
@@ -128,7 +134,7 @@ def get_default_desktops(mime_type: str, interactive=False):
 
         get_desktop_name = make_get_desktop_name()
 
-        def extract_from_system_config() -> str | list[str]:
+        def extract_from_system_config() -> str | list[str] | None:
             for mime_config in system_configs:
                 if isfile(mime_config):
                     config.read(mime_config)
@@ -136,7 +142,7 @@ def get_default_desktops(mime_type: str, interactive=False):
                     if mime_type in mime_section:
                         return get_desktop_name(mime_section, mime_type)
             else:
-                return fallback_to_text_editor()
+                return None
 
         def extract_from_user_config():
             def make_extract(
@@ -3,13 +3,25 @@ import sys
 from collections.abc import Callable
 from os import getenv
 from pathlib import Path
-from subprocess import run
+from subprocess import PIPE
 
-from my_utils.os import get_mime_type
+from my_utils.fntools import disk_cache, instrument, timed
+from my_utils.os import file_identity, get_mime_type
+from my_utils.proc import run
 
 import thumb
 
+# each preview runs in a new process, so only a cache on disk can be reused.
+# The MIME type depends on the suffix, so the key includes the path,
+# a renamed file keeps its inode and mtime
+cached_mime_type = disk_cache(
+    "mime_type", key=lambda file: (str(Path(file).resolve()), *file_identity(file))
+)(timed()(get_mime_type))
+# latencies are dumped at exit when `$MY_UTILS_TIMINGS` is set
+instrument(thumb, "gen_thumb", "get_file_id")
 
+
+@disk_cache("audio_has_cover")
 def audio_has_cover(audio: str | Path):
     from pymediainfo import MediaInfo
 
@@ -66,6 +78,18 @@ class Case:
         return None if self.__default is None else self.__default(x)
 
 
+@disk_cache("archive_listing")
+def list_archive(file: Path, cmd: list[str]) -> bytes:
+    # member names may not be UTF-8, the listing is passed through as raw bytes,
+    # and stderr of a failing tool still goes to the terminal
+    return run([*cmd, "--", file], check=True, stdout=PIPE).stdout
+
+
+def print_archive(file: Path, cmd: list[str]):
+    sys.stdout.flush()
+    sys.stdout.buffer.write(list_archive(file, cmd))
+
+
 def fallback_to_non_image(file: Path, mime_type: tuple[str, str]):
     def make_archive_case():
         case.append(
@@ -86,24 +110,22 @@ def fallback_to_non_image(file: Path, mime_type: tuple[str, str]):
                 ("application", "x-compress"),
                 ("application", "zip"),
             },
-            lambda mime_type: run(
+            lambda mime_type: print_archive(
+                file,
                 [
                     "atool",
                     "--list",
                     *(("-F", "zip") if mime_type[1] == "zip" else ()),
-                    "--",
-                    file,
                 ],
-                check=True,
             ),
         )
         case.append(
             {("application", "vnd.rar")},
-            lambda _: run(["unrar", "lt", "-p-", "--", file], check=True),
+            lambda _: print_archive(file, ["unrar", "lt", "-p-"]),
         )
         case.append(
             {("application", "x-7z-compressed")},
-            lambda _: run(["7z", "l", "-p", "--", file], check=True),
+            lambda _: print_archive(file, ["7z", "l", "-p"]),
         )
 
     def make_document_case():
@@ -161,6 +183,7 @@ def fallback_to_non_image(file: Path, mime_type: tuple[str, str]):
     case.run(mime_type)
 
 
+@timed()
 def preview_text(file: str | Path):
     # `lf` can't show output for a line of long string
     # See: https://github.com/gokcehan/lf/pull/1447
@@ -218,7 +241,7 @@ def main():
     if file.stat().st_size == 0:
         fallback_to_file_cmd(file)
     else:
-        mime_type = get_mime_type(file)
+        mime_type = cached_mime_type(file)
         if mime_type[0] == "image":
             print_pure_image(file)
         else:
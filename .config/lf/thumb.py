@@ -3,6 +3,7 @@
 See also:
 https://raw.githubusercontent.com/duganchen/kitty-pistol-previewer/main/vidthumb
 """
+
 from pathlib import Path
 from sys import argv
 
@@ -12,7 +13,9 @@ from my_utils.os import get_file_id
 def gen_thumb(
     media: str | Path, thumb_path: str | Path, mime_type: tuple[str, str] | None = None
 ):
-    from subprocess import DEVNULL, run
+    from subprocess import DEVNULL
+
+    from my_utils.proc import run
 
     def gen_for_video():
         run(
@@ -106,10 +109,19 @@ def prepare(cache_dir: Path):
 def create_thumb_if_necessary(
     media: Path, thumb_path: Path, mime_type: tuple[str, str] | None = None
 ):
+    from os import getpid, replace
+
     if (thumb_path).is_file():
         return
-    else:
-        gen_thumb(media, thumb_path, mime_type)
+    # overlapping previews of the same file each write to their own temporary file,
+    # which is renamed into place, so none of them reads a half-written thumbnail.
+    # It keeps the `.jpg` suffix, which the generators pick the format by.
+    tmp_path = thumb_path.with_name(f".{getpid()}.{thumb_path.name}")
+    try:
+        gen_thumb(media, tmp_path, mime_type)
+        replace(tmp_path, thumb_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 def main(file: Path | None = None, mime_type: tuple[str, str] | None = None):
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 from pathlib import Path
-from subprocess import run
 
 from my_utils.iters import for_each
 from my_utils.os import get_permission, slice_path
+from my_utils.proc import run
 from xdg import BaseDirectory
 
 
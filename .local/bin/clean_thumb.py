@@ -59,12 +59,14 @@ def clean_by_cache_mtime(cache_dir: Path):
     now = datetime.now()
     (
         Stream(cache_dir.iterdir())
+        .map(lambda path: (path, path.stat().st_mtime))
+        .prefetch(64)
         .filterfalse(
-            lambda path: within_one_month(
-                datetime.fromtimestamp(path.stat().st_mtime), now
+            lambda path_mtime: within_one_month(
+                datetime.fromtimestamp(path_mtime[1]), now
             )
         )
-        .for_each(lambda path: path.unlink(missing_ok=True))
+        .for_each(lambda path_mtime: path_mtime[0].unlink(missing_ok=True))
     )
 
 
@@ -2,7 +2,9 @@
 import argparse
 import logging
 import re
-from subprocess import CalledProcessError, run
+from subprocess import CalledProcessError
+
+from my_utils.proc import run
 
 
 def parse_args() -> tuple[str, bool, bool, int]:
@@ -2,10 +2,11 @@
 import asyncio
 from argparse import ArgumentParser
 from pathlib import Path
-from subprocess import run
 
-from my_utils.iters import is_empty, natsort
+from my_utils.iters import is_empty, natsorted
 from my_utils.os import get_mime_type_async
+from my_utils.proc import run
+from my_utils.stream import AsyncStream
 
 
 def gen_playlist_file(file: str | Path, playlist: list[str]) -> None:
@@ -16,20 +17,17 @@ def gen_playlist_file(file: str | Path, playlist: list[str]) -> None:
         return
 
 
-async def gen_playlist(dir: Path) -> list[str]:
-    files = tuple(filter(lambda f: f.is_file(), dir.iterdir()))
-    tasks = map(lambda file: get_mime_type_async(file), files)
-    mime_types: list[tuple[str, str]] = await asyncio.gather(*tasks)
+async def gen_playlist(dir: Path, limit: int = 16) -> list[str]:
+    async def with_mime_type(file: Path) -> tuple[Path, tuple[str, str]]:
+        return file, await get_mime_type_async(file)
+
     allowed_mime_types = {"video", "audio"}
-    return sorted(
-        map(
-            lambda file_mime: file_mime[0].parts[-1],
-            filter(
-                lambda file_mime: file_mime[1][0] in allowed_mime_types,
-                zip(files, mime_types, strict=True),
-            ),
-        ),
-        key=natsort,
+    return natsorted(
+        await AsyncStream(filter(lambda f: f.is_file(), dir.iterdir()))
+        .map_concurrent(with_mime_type, limit=limit)
+        .filter(lambda file_mime: file_mime[1][0] in allowed_mime_types)
+        .map(lambda file_mime: file_mime[0].parts[-1])
+        .to_list()
     )
 
 
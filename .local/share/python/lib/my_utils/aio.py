@@ -1,13 +1,20 @@
 import asyncio
+from time import perf_counter_ns
+
+from my_utils.proc import record
 
 
 async def run(cmd: list[str], check: bool = False, text: bool = False):
+    """The calls are recorded to the trace of `my_utils.proc`."""
+    start = perf_counter_ns()
     p = await asyncio.create_subprocess_exec(
         *cmd,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
+    spawn = perf_counter_ns() - start
     stdout, stderr = await p.communicate()
+    record(cmd, spawn, perf_counter_ns() - start, p.returncode, stdout)
     p.stdout, p.stderr = (  # pyright: ignore [reportAttributeAccessIssue]
         (stdout.decode(), stderr.decode()) if text else (stdout, stderr)
     )
@@ -0,0 +1,98 @@
+"""
+Micro benchmarks of `Stream` and `iters` against raw builtin/itertools code.
+
+Run `python -m my_utils.bench --help` for the command line interface.
+"""
+
+import re
+import time
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple
+
+
+class Case(NamedTuple):
+    """
+    A pair of equivalent functions consuming the same input.
+
+    `setup` builds the input from a size, `claim` quotes the docstring
+    statement checked by the case, if any.
+    """
+
+    group: str
+    name: str
+    ours: Callable[[Any], Any]
+    raw: Callable[[Any], Any]
+    setup: Callable[[int], Any] = lambda size: list(range(size))
+    claim: str = ""
+
+
+def measure(fn: Callable[[Any], Any], data: Any, min_time: float, repeat: int) -> float:
+    """Returns the best time in seconds of a single call of `fn(data)`."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(data)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(data)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def run(
+    cases: Iterable[Case],
+    sizes: Iterable[int],
+    pattern: str = "",
+    min_time: float = 0.05,
+    repeat: int = 3,
+    on_result: Callable[[dict[str, Any]], Any] = lambda _: None,
+) -> list[dict[str, Any]]:
+    """
+    Times both sides of every case whose `group.name` matches `pattern`.
+
+    Returns:
+        One record per case and size, with times in ns per input element.
+    """
+    regex = re.compile(pattern)
+    results = []
+    for case in filter(lambda c: regex.search(f"{c.group}.{c.name}"), cases):
+        for size in sizes:
+            data = case.setup(size)
+            ours = measure(case.ours, data, min_time, repeat) / size * 1e9
+            raw = measure(case.raw, data, min_time, repeat) / size * 1e9
+            result = {
+                "case": f"{case.group}.{case.name}",
+                "size": size,
+                "ours_ns": ours,
+                "raw_ns": raw,
+                "ratio": ours / raw,
+                "claim": case.claim,
+            }
+            on_result(result)
+            results.append(result)
+    return results
+
+
+def compare(
+    old: list[dict[str, Any]], new: list[dict[str, Any]], threshold: float = 1.1
+) -> list[tuple[str, int, float]]:
+    """
+    Finds cases slower in `new` than in `old` by more than `threshold` times.
+
+    Returns:
+        Tuples of case name, size and slowdown of the `ours` side.
+    """
+    baseline = {(r["case"], r["size"]): r["ours_ns"] for r in old}
+    return [
+        (r["case"], r["size"], r["ours_ns"] / baseline[(r["case"], r["size"])])
+        for r in new
+        if (r["case"], r["size"]) in baseline
+        and r["ours_ns"] > threshold * baseline[(r["case"], r["size"])]
+    ]
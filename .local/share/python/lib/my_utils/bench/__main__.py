@@ -0,0 +1,112 @@
+import json
+import platform
+import sys
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from subprocess import run as run_cmd
+
+from my_utils.bench import compare, run
+from my_utils.bench.cases import CASES
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(
+        description="Time Stream and iters against raw builtin/itertools code"
+    )
+    parser.add_argument(
+        "-k",
+        "--filter",
+        type=str,
+        default="",
+        help="only run cases whose 'group.name' matches this regex",
+    )
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 10_000, 1_000_000],
+        help="input sizes (default: 100 10000 1000000)",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.05,
+        help="minimum seconds per measurement (default: 0.05)",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="repetitions, the best is kept"
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, default=None, help="save results as JSON"
+    )
+    parser.add_argument(
+        "-c",
+        "--compare",
+        type=Path,
+        default=None,
+        help="a previous JSON output to report regressions against",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="list the cases and their claims"
+    )
+    return parser.parse_args()
+
+
+def get_revision() -> str | None:
+    p = run_cmd(
+        ["git", "rev-parse", "--short", "HEAD"],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent,
+    )
+    return p.stdout.rstrip() if p.returncode == 0 else None
+
+
+def print_result(result: dict) -> None:
+    print(
+        f"{result['case']:<28} {result['size']:>9} "
+        f"{result['ours_ns']:>10.1f} {result['raw_ns']:>10.1f} {result['ratio']:>7.2f}",
+        flush=True,
+    )
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        for case in CASES:
+            print(f"{case.group}.{case.name}", case.claim, sep="\t")
+        return
+
+    print(f"{'case':<28} {'size':>9} {'ours ns/el':>10} {'raw ns/el':>10} {'ratio':>7}")
+    results = run(
+        CASES,
+        args.sizes,
+        args.filter,
+        args.min_time,
+        args.repeat,
+        on_result=print_result,
+    )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "revision": get_revision(),
+                    "python": platform.python_version(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f)["results"], results)
+        for case, size, slowdown in regressions:
+            print(f"regression: {case} at {size} is {slowdown:.2f}x slower")
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
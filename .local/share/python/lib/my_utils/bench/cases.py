@@ -0,0 +1,325 @@
+import heapq
+import itertools
+import operator
+import re
+from collections import Counter, deque
+from functools import reduce
+
+from my_utils import iters
+from my_utils.bench import Case
+from my_utils.stream import Stream
+
+
+def consume(it) -> None:
+    deque(it, maxlen=0)
+
+
+def inc(x: int) -> int:
+    return x + 1
+
+
+def is_odd(x: int) -> bool:
+    return x & 1 == 1
+
+
+def is_negative(x: int) -> bool:
+    return x < 0
+
+
+def pair(x: int) -> tuple[int, int]:
+    return x, x
+
+
+def halves(size: int) -> tuple[list[int], list[int]]:
+    return list(range(size)), list(range(size // 2, size + size // 2))
+
+
+def runs(size: int) -> list[int]:
+    return [i // 4 for i in range(size)]
+
+
+def file_names(size: int) -> list[str]:
+    return [f"track {i % 97} part{i}.flac" for i in range(size)]
+
+
+def split_key(s: str) -> tuple[int | str, ...]:
+    return tuple(
+        int(text) if text.isdigit() else text for text in re.split(r"(\d+)", s)
+    )
+
+
+def nested(size: int) -> list[list[int]]:
+    return [list(range(i, i + 10)) for i in range(0, size, 10)]
+
+
+def deque_window(iterable, n: int):
+    it = iter(iterable)
+    window = deque(itertools.islice(it, n - 1), maxlen=n)
+    for ele in it:
+        window.append(ele)
+        yield tuple(window)
+
+
+def tee_window(iterable, n: int):
+    iterators = itertools.tee(iterable, n)
+    for i, it in enumerate(iterators):
+        consume(zip(itertools.repeat(None, i), it))
+    return zip(*iterators)
+
+
+STREAM = [
+    Case(
+        "stream",
+        "map",
+        lambda d: consume(Stream(d).map(inc)),
+        lambda d: consume(map(inc, d)),
+    ),
+    Case(
+        "stream",
+        "filter",
+        lambda d: consume(Stream(d).filter(is_odd)),
+        lambda d: consume(filter(is_odd, d)),
+    ),
+    Case(
+        "stream",
+        "filterfalse",
+        lambda d: consume(Stream(d).filterfalse(is_odd)),
+        lambda d: consume(itertools.filterfalse(is_odd, d)),
+    ),
+    Case(
+        "stream",
+        "flatmap",
+        lambda d: consume(Stream(d).flatmap(pair)),
+        lambda d: consume(itertools.chain.from_iterable(map(pair, d))),
+    ),
+    Case(
+        "stream",
+        "map_filter_chain",
+        lambda d: consume(Stream(d).map(inc).filter(is_odd).map(inc).filter(is_odd)),
+        lambda d: consume(filter(is_odd, map(inc, filter(is_odd, map(inc, d))))),
+    ),
+    Case(
+        "stream",
+        "deferred_chain",
+        lambda d: consume(
+            Stream(d).deferred().map(inc).filter(is_odd).map(inc).filter(is_odd)
+        ),
+        lambda d: consume(filter(is_odd, map(inc, filter(is_odd, map(inc, d))))),
+    ),
+    Case(
+        "stream",
+        "enumerate",
+        lambda d: consume(Stream(d).enumerate()),
+        lambda d: consume(enumerate(d)),
+    ),
+    Case(
+        "stream",
+        "zip",
+        lambda d: consume(Stream(d).zip(d)),
+        lambda d: consume(zip(d, d)),
+    ),
+    Case(
+        "stream",
+        "limit",
+        lambda d: consume(Stream(d).limit(len(d) // 2)),
+        lambda d: consume(itertools.islice(d, len(d) // 2)),
+    ),
+    Case(
+        "stream",
+        "drop_first",
+        lambda d: consume(Stream(d).drop_first(len(d) // 2)),
+        lambda d: consume(itertools.islice(d, len(d) // 2, None)),
+    ),
+    Case(
+        "stream",
+        "take_last",
+        lambda d: consume(Stream(iter(d)).take_last(10)),
+        lambda d: consume(deque(iter(d), maxlen=10)),
+    ),
+    Case(
+        "stream",
+        "drop_last",
+        lambda d: consume(Stream(d).drop_last(10)),
+        lambda d: consume(itertools.islice(d, len(d) - 10)),
+    ),
+    Case(
+        "stream",
+        "pairwise",
+        lambda d: consume(Stream(d).pairwise()),
+        lambda d: consume(itertools.pairwise(d)),
+    ),
+    Case(
+        "stream",
+        "nwise",
+        lambda d: consume(Stream(d).nwise(3)),
+        lambda d: consume(deque_window(d, 3)),
+        claim="`nwise` uses `itertools.tee` for n < 7 and a deque window otherwise",
+    ),
+    Case(
+        "stream",
+        "nwise_large",
+        lambda d: consume(Stream(d).nwise(8)),
+        lambda d: consume(tee_window(d, 8)),
+        claim="`nwise` uses `itertools.tee` for n < 7 and a deque window otherwise",
+    ),
+    Case(
+        "stream",
+        "sorted",
+        lambda d: consume(Stream(d).sorted(reverse=True)),
+        lambda d: consume(sorted(d, reverse=True)),
+    ),
+    Case(
+        "stream",
+        "top_k",
+        lambda d: consume(Stream(d).top_k(10, reverse=True)),
+        lambda d: consume(sorted(d, reverse=True)[:10]),
+    ),
+    Case(
+        "stream",
+        "unique_everseen",
+        lambda d: consume(Stream(d).unique_everseen()),
+        lambda d: consume(dict.fromkeys(d)),
+        setup=runs,
+    ),
+    Case(
+        "stream",
+        "unique_justseen",
+        lambda d: consume(Stream(d).unique_justseen()),
+        lambda d: consume(map(operator.itemgetter(0), itertools.groupby(d))),
+        setup=runs,
+    ),
+    Case(
+        "stream",
+        "group_by",
+        lambda d: consume(Stream(d).group_by()),
+        lambda d: consume(itertools.groupby(d)),
+        setup=runs,
+    ),
+    Case(
+        "stream",
+        "aggregate_by",
+        lambda d: Stream(d).aggregate_by(is_odd, "count"),
+        lambda d: Counter(map(is_odd, d)),
+    ),
+    Case("stream", "count", lambda d: Stream(d).count(), lambda d: sum(1 for _ in d)),
+    Case("stream", "sum", lambda d: Stream(d).sum(), sum),
+    Case("stream", "min", lambda d: Stream(d).min(), min),
+    Case("stream", "max", lambda d: Stream(d).max(), max),
+    Case(
+        "stream",
+        "reduce",
+        lambda d: Stream(d).reduce(operator.add),
+        lambda d: reduce(operator.add, d),
+    ),
+    Case(
+        "stream",
+        "any_match",
+        lambda d: Stream(d).any_match(is_negative),
+        lambda d: any(map(is_negative, d)),
+    ),
+    Case(
+        "stream",
+        "all_equal",
+        lambda d: Stream(d).all_equal(),
+        lambda d: len(set(d)) <= 1,
+        setup=lambda size: [0] * size,
+    ),
+    Case("stream", "counter", lambda d: Stream(d).counter(), Counter, setup=runs),
+    Case("stream", "to_list", lambda d: Stream(d).to_list(), list),
+    Case(
+        "stream",
+        "for_each",
+        lambda d: Stream(d).for_each(inc),
+        lambda d: consume(map(inc, d)),
+    ),
+    Case(
+        "stream",
+        "partition",
+        lambda d: tuple(map(consume, Stream(d).partition(is_odd))),
+        lambda d: (
+            consume(filter(is_odd, d)),
+            consume(itertools.filterfalse(is_odd, d)),
+        ),
+    ),
+]
+
+ITERS = [
+    Case(
+        "iters",
+        "count",
+        lambda d: iters.count(iter(d)),
+        lambda d: sum(1 for _ in iter(d)),
+        claim="`count` consumes with `deque(zip(iterable, counter), maxlen=0)`",
+    ),
+    Case(
+        "iters",
+        "is_empty",
+        lambda d: iters.is_empty(iter(d)),
+        lambda d: next(iter(d), None) is None,
+        claim="`is_empty` counts (and drains) an iterator, the raw side is O(1)",
+    ),
+    Case(
+        "iters",
+        "drop_first",
+        lambda d: consume(iters.drop_first(d, len(d) // 2)),
+        lambda d: consume(itertools.islice(d, len(d) // 2, None)),
+        claim="`drop_first` is like `itertools.islice(seq, k, None)`, but more time-efficient",
+    ),
+    Case(
+        "iters",
+        "diff",
+        lambda ab: iters.diff(*ab),
+        lambda ab: (lambda a, b: (a - b, b - a, a & b))(set(ab[0]), set(ab[1])),
+        setup=halves,
+        claim="`diff` is usually less efficient than python's built-in set operations",
+    ),
+    Case(
+        "iters",
+        "sorted_diff",
+        lambda ab: consume(iters.sorted_diff(*ab)),
+        lambda ab: (lambda a, b: (a - b, b - a, a & b))(set(ab[0]), set(ab[1])),
+        setup=halves,
+        claim="`sorted_diff` keeps O(1) memory, unlike set operations",
+    ),
+    Case(
+        "iters",
+        "flatmap",
+        lambda d: consume(iters.flatmap(pair, d)),
+        lambda d: consume(x for ele in d for x in pair(ele)),
+    ),
+    Case(
+        "iters",
+        "partition",
+        lambda d: iters.partition(is_odd, d, lazy=False),
+        lambda d: ([x for x in d if is_odd(x)], [x for x in d if not is_odd(x)]),
+    ),
+    Case(
+        "iters",
+        "for_each",
+        lambda d: iters.for_each(inc, d),
+        lambda d: consume(map(inc, d)),
+    ),
+    Case(
+        "iters",
+        "tree_map",
+        lambda d: list(iters.tree_map(inc, d)),
+        lambda d: [[inc(x) for x in sub] for sub in d],
+        setup=nested,
+    ),
+    Case(
+        "iters",
+        "natsorted",
+        iters.natsorted,
+        lambda d: sorted(d, key=split_key),
+        setup=file_names,
+        claim="`natsort` splits with a precompiled pattern",
+    ),
+    Case(
+        "iters",
+        "external_sorted",
+        lambda d: consume(iters.external_sorted(d, run_size=max(1, len(d) // 4))),
+        lambda d: consume(heapq.merge(*(sorted(d[i::4]) for i in range(4)))),
+    ),
+]
+
+CASES = STREAM + ITERS
@@ -1,6 +1,10 @@
-from collections.abc import Callable
+from collections.abc import Callable, Hashable
 from functools import wraps
-from typing import Any, ParamSpec, TypeVar
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple, ParamSpec, TypeVar
+
+if TYPE_CHECKING:
+    from sqlite3 import Connection
 
 _P = ParamSpec("_P")
 _T = TypeVar("_T")
@@ -81,6 +85,496 @@ def cache_single_value(orig_fn: Callable[_P, _T]):
     return wraps(orig_fn)(lambda *args, **kwargs: container[0](*args, **kwargs))
 
 
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    bytes: int
+
+
+class _Memo:
+    """An LRU store of `(value, expiry, size)` entries, safe across threads."""
+
+    def __init__(
+        self, maxsize: int | None, ttl: float | None, max_bytes: int | None
+    ) -> None:
+        from collections import OrderedDict
+        from threading import Lock
+
+        self.maxsize, self.ttl, self.max_bytes = maxsize, ttl, max_bytes
+        self.entries: OrderedDict[Hashable, tuple[Any, float | None, int]] = (
+            OrderedDict()
+        )
+        self.lock = Lock()
+        self.hits = self.misses = self.evictions = self.bytes = 0
+
+    def get(self, key: Hashable) -> Any:
+        from time import monotonic
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expiry, size = entry
+                if expiry is None or monotonic() < expiry:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.bytes -= size
+                self.evictions += 1
+            self.misses += 1
+            return _MISSING
+
+    def put(self, key: Hashable, value: Any) -> None:
+        from sys import getsizeof
+        from time import monotonic
+
+        size = 0 if self.max_bytes is None else getsizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[2]
+            expiry = None if self.ttl is None else monotonic() + self.ttl
+            self.entries[key] = (value, expiry, size)
+            self.bytes += size
+            while (self.maxsize is not None and len(self.entries) > self.maxsize) or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                self.bytes -= self.entries.popitem(last=False)[1][2]
+                self.evictions += 1
+
+    def info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions, len(self.entries), self.bytes
+            )
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = self.bytes = 0
+
+
+_MISSING = object()
+
+
+def _make_key(*args: Any, **kwargs: Any) -> Hashable:
+    return (args, tuple(kwargs.items())) if kwargs else args
+
+
+def memoize(
+    maxsize: int | None = 128,
+    ttl: float | None = None,
+    max_bytes: int | None = None,
+    key: Callable[..., Hashable] | None = None,
+):
+    """
+    Like `functools.lru_cache`, but entries can also expire after `ttl` seconds,
+    or be evicted once their total size exceeds `max_bytes`.
+    Coroutine functions are detected, and their awaited results are cached.
+
+    The decorated function gets `cache_info()`, returning the hits, misses,
+    evictions, number of entries and their bytes, and `cache_clear()`.
+
+    Parameters:
+        `maxsize`: The maximum number of entries, unbounded if `None`.
+        `ttl`: Seconds after which an entry expires, never if `None`.
+        `max_bytes`: The maximum total size of the entries as per `sys.getsizeof`,
+            so the contents of containers aren't counted.
+        `key`: Computes the cache key from the arguments,
+            defaults to the positional and keyword arguments, which must be hashable.
+
+    Raises:
+        `ValueError`: If `maxsize` or `max_bytes` is negative, or `ttl` isn't positive.
+
+    Example:
+        >>> @memoize(maxsize=1024, ttl=60)
+        ... def get_mime_type(file: str) -> tuple[str, str]: ...
+        >>> get_mime_type.cache_info()
+        CacheInfo(hits=0, misses=0, evictions=0, size=0, bytes=0)
+    """
+    from inspect import iscoroutinefunction
+
+    if maxsize is not None and maxsize < 0:
+        raise ValueError("'maxsize' must be greater than or equal to zero")
+    elif ttl is not None and ttl <= 0:
+        raise ValueError("'ttl' must be greater than zero")
+    elif max_bytes is not None and max_bytes < 0:
+        raise ValueError("'max_bytes' must be greater than or equal to zero")
+    make_key = _make_key if key is None else key
+
+    def decorator(orig_fn: Callable[_P, _T]) -> Callable[_P, _T]:
+        memo = _Memo(maxsize, ttl, max_bytes)
+
+        if iscoroutinefunction(orig_fn):
+
+            @wraps(orig_fn)
+            async def new_fn(  # pyright: ignore [reportRedeclaration]
+                *args, **kwargs
+            ) -> _T:
+                k = make_key(*args, **kwargs)
+                value = memo.get(k)
+                if value is _MISSING:
+                    value = await orig_fn(*args, **kwargs)
+                    memo.put(k, value)
+                return value
+
+        else:
+
+            @wraps(orig_fn)
+            def new_fn(*args, **kwargs) -> _T:
+                k = make_key(*args, **kwargs)
+                value = memo.get(k)
+                if value is _MISSING:
+                    value = orig_fn(*args, **kwargs)
+                    memo.put(k, value)
+                return value
+
+        new_fn.cache_info = memo.info  # pyright: ignore [reportAttributeAccessIssue]
+        new_fn.cache_clear = memo.clear  # pyright: ignore [reportAttributeAccessIssue]
+        return new_fn  # pyright: ignore [reportReturnType]
+
+    return decorator
+
+
+class _DiskStore:
+    """
+    A pickled key-value store in an SQLite database,
+    whose least recently used entries are deleted beyond `max_bytes`.
+    """
+
+    # Seconds within which a hit doesn't refresh the access time of its entry
+    ATIME_RESOLUTION = 60.0
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        from threading import Lock
+
+        self.path, self.max_bytes = path, max_bytes
+        self.lock = Lock()
+        self.__conn: "Connection | None" = None
+
+    def __connect(self) -> "Connection":
+        import sqlite3
+
+        if self.__conn is None:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            # Transactions are managed explicitly, `BEGIN IMMEDIATE` makes writers
+            # of concurrent processes queue up instead of failing on commit
+            conn = sqlite3.connect(
+                self.path, timeout=1.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, atime REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)")
+            self.__conn = conn
+        return self.__conn
+
+    def get(self, key: str) -> Any:
+        import pickle
+        import sqlite3
+        from time import time
+
+        with self.lock:
+            try:
+                conn = self.__connect()
+                row = conn.execute(
+                    "SELECT value, atime FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error:
+                return _MISSING
+            if row is None:
+                return _MISSING
+            # The LRU order only needs to be coarse,
+            # so most hits are reads that don't take the write lock
+            now = time()
+            if now - row[1] > self.ATIME_RESOLUTION:
+                try:
+                    conn.execute(
+                        "UPDATE entries SET atime = ? WHERE key = ?", (now, key)
+                    )
+                except sqlite3.Error:  # busy, the hit is still served
+                    pass
+        try:
+            return pickle.loads(row[0])
+        except Exception:  # written by an incompatible version of the function
+            return _MISSING
+
+    def put(self, key: str, value: Any) -> None:
+        import pickle
+        import sqlite3
+        from time import time
+
+        try:
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return  # like a generator or a local function, the value stays uncached
+        if len(blob) > self.max_bytes:
+            return
+        with self.lock:
+            conn = None
+            try:
+                conn = self.__connect()
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time()),
+                )
+                (total,) = conn.execute("SELECT SUM(size) FROM entries").fetchone()
+                if total > self.max_bytes:
+                    self.__trim(conn, total - self.max_bytes)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                if conn is not None and conn.in_transaction:
+                    conn.execute("ROLLBACK")
+
+    @staticmethod
+    def __trim(conn: "Connection", excess: int) -> None:
+        victims: list[tuple[str]] = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY atime"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.__connect().execute("DELETE FROM entries")
+
+
+def disk_cache(
+    namespace: str,
+    key: Callable[..., Hashable] | None = None,
+    max_bytes: int = 64 << 20,
+    cache_dir: str | Path | None = None,
+):
+    """
+    Caches results on disk, so they are shared across processes and outlive them,
+    like for `lf` previews, which run in a fresh process for every file.
+
+    Results are pickled into the SQLite database
+    `$XDG_CACHE_HOME/my_utils/{namespace}.sqlite3`,
+    each write is an atomic transaction, and the least recently used entries
+    are deleted once their total size exceeds `max_bytes`.
+    The cache is best-effort, a database error only makes the call uncached.
+    Coroutine functions are detected, and their awaited results are cached.
+
+    Parameters:
+        `namespace`: The name of the database, unique per cached function.
+        `key`: Computes the cache key from the arguments, its `repr` is stored,
+            defaults to `my_utils.os.file_identity` of the first argument,
+            so modifying the file invalidates its entry.
+            The default only suits functions of the file content alone,
+            a renamed file keeps its entry, so add the path for suffix-based results.
+        `cache_dir`: Overrides `$XDG_CACHE_HOME/my_utils`.
+
+    Example:
+        >>> @disk_cache("audio_has_cover")
+        ... def audio_has_cover(audio: Path) -> bool: ...
+    """
+    from inspect import iscoroutinefunction
+    from os import getenv
+
+    if max_bytes < 0:
+        raise ValueError("'max_bytes' must be greater than or equal to zero")
+    if key is None:
+        from my_utils.os import file_identity
+
+        key = file_identity
+    make_key = key
+    root = (
+        Path(getenv("XDG_CACHE_HOME") or "~/.cache", "my_utils").expanduser()
+        if cache_dir is None
+        else Path(cache_dir)
+    )
+    store = _DiskStore(root / f"{namespace}.sqlite3", max_bytes)
+
+    def decorator(orig_fn: Callable[_P, _T]) -> Callable[_P, _T]:
+        if iscoroutinefunction(orig_fn):
+
+            @wraps(orig_fn)
+            async def new_fn(  # pyright: ignore [reportRedeclaration]
+                *args, **kwargs
+            ) -> _T:
+                k = repr(make_key(*args, **kwargs))
+                value = store.get(k)
+                if value is _MISSING:
+                    value = await orig_fn(*args, **kwargs)
+                    store.put(k, value)
+                return value
+
+        else:
+
+            @wraps(orig_fn)
+            def new_fn(*args, **kwargs) -> _T:
+                k = repr(make_key(*args, **kwargs))
+                value = store.get(k)
+                if value is _MISSING:
+                    value = orig_fn(*args, **kwargs)
+                    store.put(k, value)
+                return value
+
+        new_fn.cache_clear = store.clear  # pyright: ignore [reportAttributeAccessIssue]
+        return new_fn  # pyright: ignore [reportReturnType]
+
+    return decorator
+
+
+class _Flight:
+    """A call in progress, whose outcome is shared by the callers of the same key."""
+
+    def __init__(self) -> None:
+        from threading import Event
+
+        self.done = Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+
+def single_flight(key: Callable[..., Hashable] | None = None):
+    """
+    Coalesces concurrent calls with the same key, so while a call is in progress,
+    the other callers wait for its result (or exception) instead of repeating it.
+    Unlike `memoize`, nothing is kept once the call finishes.
+
+    Works across threads, and for coroutine functions across the tasks of a loop,
+    where the call runs in its own task, so it isn't cancelled with a caller.
+
+    Parameters:
+        `key`: Computes the key from the arguments,
+            defaults to the positional and keyword arguments, which must be hashable.
+
+    Example:
+        >>> @single_flight()
+        ... async def get_mime_type(file: Path) -> tuple[str, str]: ...
+    """
+    from inspect import iscoroutinefunction
+    from threading import Lock
+
+    make_key = _make_key if key is None else key
+
+    def decorator(orig_fn: Callable[_P, _T]) -> Callable[_P, _T]:
+        if iscoroutinefunction(orig_fn):
+            import asyncio
+
+            tasks: dict[Hashable, asyncio.Task[Any]] = {}
+
+            @wraps(orig_fn)
+            async def new_fn(  # pyright: ignore [reportRedeclaration]
+                *args, **kwargs
+            ) -> _T:
+                k = make_key(*args, **kwargs)
+                task = tasks.get(k)
+                if task is None:
+                    task = asyncio.ensure_future(orig_fn(*args, **kwargs))
+                    tasks[k] = task
+                    task.add_done_callback(lambda _: tasks.pop(k, None))
+                return await asyncio.shield(task)
+
+        else:
+            flights: dict[Hashable, _Flight] = {}
+            lock = Lock()
+
+            @wraps(orig_fn)
+            def new_fn(*args, **kwargs) -> _T:
+                k = make_key(*args, **kwargs)
+                with lock:
+                    flight = flights.get(k)
+                    is_leader = flight is None
+                    if flight is None:
+                        flight = flights[k] = _Flight()
+                if is_leader:
+                    try:
+                        flight.value = orig_fn(*args, **kwargs)
+                    except BaseException as e:
+                        flight.error = e
+                        raise
+                    finally:
+                        with lock:
+                            del flights[k]
+                        flight.done.set()
+                    return flight.value
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+
+        return new_fn  # pyright: ignore [reportReturnType]
+
+    return decorator
+
+
+def timed(name: str | None = None):
+    """
+    Records the latency of every call into a histogram of `name`,
+    which defaults to the qualified name of the function.
+
+    Unlike `debug_fn`, nothing is printed per call, the histograms of all threads
+    are dumped at exit according to `$MY_UTILS_TIMINGS`:
+    `stderr` prints a table of count, p50, p90, p99, max and total,
+    a path appends them as a JSON line,
+    to be merged with `python -m my_utils.profiling PATH`.
+    Coroutine functions are detected, and timed until they return.
+
+    Example:
+        >>> @timed()
+        ... def preview_text(file: Path) -> None: ...
+    """
+    from inspect import iscoroutinefunction
+    from time import perf_counter_ns
+
+    from my_utils.profiling import histogram
+
+    def decorator(orig_fn: Callable[_P, _T]) -> Callable[_P, _T]:
+        label = f"{orig_fn.__module__}.{orig_fn.__qualname__}" if name is None else name
+
+        if iscoroutinefunction(orig_fn):
+
+            @wraps(orig_fn)
+            async def new_fn(  # pyright: ignore [reportRedeclaration]
+                *args, **kwargs
+            ) -> _T:
+                start = perf_counter_ns()
+                try:
+                    return await orig_fn(*args, **kwargs)
+                finally:
+                    histogram(label).record(perf_counter_ns() - start)
+
+        else:
+
+            @wraps(orig_fn)
+            def new_fn(*args, **kwargs) -> _T:
+                start = perf_counter_ns()
+                try:
+                    return orig_fn(*args, **kwargs)
+                finally:
+                    histogram(label).record(perf_counter_ns() - start)
+
+        return new_fn  # pyright: ignore [reportReturnType]
+
+    return decorator
+
+
+def instrument(obj: Any, *names: str) -> None:
+    """
+    Replaces the functions `names` of `obj` (like a module or a class)
+    with `timed` versions, to time code without editing it.
+
+    Example:
+        >>> import thumb
+        >>> instrument(thumb, "gen_thumb", "get_file_id")
+    """
+    for name in names:
+        setattr(obj, name, timed()(getattr(obj, name)))
+
+
 def debug_fn(orig_fn: Callable[_P, _T], name: str = ""):
     @wraps(orig_fn)
     def new_fn(*args, **kwargs) -> _T:
@@ -2,7 +2,9 @@ import logging
 from itertools import filterfalse
 from os import environ, getcwd
 from os.path import dirname, exists, isdir, islink, join
-from subprocess import CalledProcessError, run
+from subprocess import CalledProcessError
+
+from .proc import run
 
 
 def get_tracked_files(
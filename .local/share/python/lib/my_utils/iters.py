@@ -1,12 +1,33 @@
 import itertools
+import re
 from collections import deque
-from collections.abc import Callable, Collection, Iterable, Iterator, Sized
-from typing import Any, Literal, TypeVar, overload
+from collections.abc import (
+    Awaitable,
+    Callable,
+    Collection,
+    Iterable,
+    Iterator,
+    Sized,
+)
+from typing import TYPE_CHECKING, Any, Literal, Protocol, TypeVar, overload
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from my_utils.parallel import ExecutorKind
 
 T = TypeVar("T")
 U = TypeVar("U")
 
 
+class Comparable(Protocol):
+    def __lt__(self, __other) -> bool: ...
+    def __eq__(self, __other: object) -> bool: ...
+
+
+C = TypeVar("C", bound=Comparable)
+
+
 def count(iterable: Iterable[T]) -> int:
     counter = itertools.count()
     deque(zip(iterable, counter), maxlen=0)
@@ -101,43 +122,137 @@ def flatmap(
     return itertools.chain.from_iterable(map(operation, iterable))
 
 
+class _Node(list[Any]):
+    """A container of a tree whose leaves are yet to be filled in."""
+
+    pass
+
+
+def _is_node(ele: Any, node_type: type | tuple[type, ...]) -> bool:
+    """
+    Strings and bytes are leaves, since a one-character string iterates to itself,
+    so descending into them never ends.
+    """
+    return isinstance(ele, node_type) and not isinstance(ele, (str, bytes, bytearray))
+
+
+def _tree_build(
+    node: Iterable[Any],
+    leaf: Callable[[Any], Any],
+    node_type: type | tuple[type, ...],
+    convert: Callable[[list[Any]], Any],
+) -> list[Any]:
+    """
+    Rebuilds `node` with an explicit stack, so the depth is unbounded.
+    Inner containers are built by `convert`, the children of `node` are returned as is.
+    """
+    stack: list[tuple[Iterator[Any], list[Any]]] = [(iter(node), [])]
+    while True:
+        it, children = stack[-1]
+        for ele in it:
+            if _is_node(ele, node_type):
+                stack.append((iter(ele), []))
+                break
+            children.append(leaf(ele))
+        else:
+            stack.pop()
+            if len(stack) == 0:
+                return children
+            stack[-1][1].append(convert(children))
+
+
+def tree_leaves(
+    iterable: Iterable[Any], node_type: type | tuple[type, ...] | None = None
+) -> Iterator[Any]:
+    """
+    Lazily yields the leaves of a nested structure in depth-first order,
+    where `node_type` defaults to the type of `iterable`.
+    """
+    node_type = type(iterable) if node_type is None else node_type
+    stack = [iter(iterable)]
+    while len(stack) > 0:
+        for ele in stack[-1]:
+            if _is_node(ele, node_type):
+                stack.append(iter(ele))
+                break
+            yield ele
+        else:
+            stack.pop()
+
+
 def tree_map(
     operation: Callable[[Any], Any],
     iterable: Iterable[Any],
     inner_iterable_type: Callable[[Any], Iterable[Any]] | None = None,
+    flatten: bool = False,
+    executor: "ExecutorKind | None" = None,
+    workers: int | None = None,
+    chunksize: int = 256,
 ) -> Iterator[Any]:
     """
     Applies a given operation to each element in a nested stream structure.
-    If an element is a sub-iterable, the function is called recursively on that element.
+    If an element is a sub-iterable of the same type as `iterable`,
+    the operation is applied to its elements as well.
+
+    Nested iterables are walked with an explicit stack,
+    so there is no limit on the depth of the structure.
+    Strings and bytes are always leaves.
 
     Parameters:
         `operation`: A function to be applied to each element in the stream.
-        `inner_iterable_type`: A function to convert inner iterables, defaults to Stream.
+        `inner_iterable_type`: A function to convert inner iterables,
+            defaults to the type of `iterable`.
+        `flatten`: Lazily yields the transformed leaves in order,
+            without rebuilding the containers.
+        `executor`: Applies `operation` to the leaves in a `"thread"` or `"process"`
+            pool, `chunksize` leaves at a time.
+            Unless `flatten` is set, the whole structure is read before the first result.
+        `workers`: The size of the pool.
 
     Returns:
-        A Stream over the transformed stream.
+        An iterator over the transformed elements of `iterable`.
+
+    Example:
+        >>> list(tree_map(lambda x: x * 2, [1, [2, [3]]]))
+        [2, [4, [6]]]
+        >>> list(tree_map(lambda x: x * 2, [1, [2, [3]]], flatten=True))
+        [2, 4, 6]
     """
     if not isinstance(iterable, Iterable):
         raise TypeError("'iterable' should be an instance of Iterable")
-    else:
 
-        def iteration(iterable: Iterable[Any]) -> Iterator[Any]:
-            return map(
-                (  # `convert_type` eagerly evaluates the inner `map` object
-                    lambda ele: (
-                        convert_type(iteration(ele))
-                        if isinstance(ele, iterable_type)
-                        else operation(ele)
-                    )
-                ),
-                iterable,
-            )
+    from my_utils import parallel
+
+    iterable_type = type(iterable)
+    convert_type = iterable_type if inner_iterable_type is None else inner_iterable_type
 
-        iterable_type = type(iterable)
-        convert_type = (
-            iterable_type if inner_iterable_type is None else inner_iterable_type
+    if flatten:
+        leaves = tree_leaves(iterable, iterable_type)
+        return (
+            map(operation, leaves)
+            if executor is None
+            else parallel.imap(operation, leaves, workers, executor, True, chunksize)
         )
-        return iteration(iterable)
+    elif executor is None:
+        return map(
+            lambda ele: (
+                convert_type(
+                    _tree_build(  # pyright: ignore [reportCallIssue]
+                        ele, operation, iterable_type, convert_type
+                    )
+                )
+                if _is_node(ele, iterable_type)
+                else operation(ele)
+            ),
+            iterable,
+        )
+    else:
+        # Extract the leaves into a skeleton of `_Node`s,
+        # then fill it in with the results of the pool
+        leaves = []
+        skeleton = _tree_build(iterable, leaves.append, iterable_type, _Node)
+        results = parallel.imap(operation, leaves, workers, executor, True, chunksize)
+        return iter(_tree_build(skeleton, lambda _: next(results), _Node, convert_type))
 
 
 def drop_first(iterable: Iterable[T], k: int = 1) -> Iterator[T]:
@@ -150,6 +265,122 @@ def drop_first(iterable: Iterable[T], k: int = 1) -> Iterator[T]:
         return it
 
 
+@overload
+def external_sorted(
+    iterable: Iterable[C],
+    key: None = None,
+    reverse: bool = False,
+    run_size: int = 1 << 20,
+    encoding: str | None = None,
+    tmp_dir: str | None = None,
+) -> Iterator[C]: ...
+@overload
+def external_sorted(
+    iterable: Iterable[T],
+    key: Callable[[T], Comparable],
+    reverse: bool = False,
+    run_size: int = 1 << 20,
+    encoding: str | None = None,
+    tmp_dir: str | None = None,
+) -> Iterator[T]: ...
+
+
+def external_sorted(
+    iterable: Iterable[Any],
+    key: Callable[[Any], Any] | None = None,
+    reverse: bool = False,
+    run_size: int = 1 << 20,
+    encoding: str | None = None,
+    tmp_dir: str | None = None,
+) -> Iterator[Any]:
+    """
+    Like `sorted`, but only `run_size` elements are held in memory at a time.
+
+    The input is cut into runs of `run_size` elements,
+    each run is sorted and spilled to an anonymous temporary file,
+    then all runs are lazily k-way merged by `heapq.merge`.
+    When the whole input fits in a single run, nothing touches the disk.
+    The sort is stable, just like `sorted`.
+
+    Parameters:
+        `run_size`: Number of elements sorted in memory per run.
+        `encoding`: `None` to spill runs with `pickle`,
+            or a `struct` format (like `"q"` or `"dq"`) for fixed-size records,
+            single-field formats are for scalars, others for tuples.
+        `tmp_dir`: Directory of the temporary files, see `tempfile.TemporaryFile`.
+
+    Returns:
+        An iterator over the sorted elements.
+
+    Raises:
+        `ValueError`: If `run_size` is less than 1.
+    """
+    import heapq
+    import pickle
+    import struct
+    from operator import itemgetter
+    from tempfile import TemporaryFile
+    from typing import IO
+
+    if run_size < 1:
+        raise ValueError("'run_size' must be at least 1")
+    batch_size = 1024
+    record = None if encoding is None else struct.Struct(encoding)
+    is_scalar = record is not None and len(record.unpack(bytes(record.size))) == 1
+
+    def write_run(run: list[Any], f: IO[bytes]) -> None:
+        for i in range(0, len(run), batch_size):
+            batch = run[i : i + batch_size]
+            if record is None:
+                pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+            elif is_scalar:
+                f.write(b"".join(map(record.pack, batch)))
+            else:
+                f.write(
+                    b"".join(
+                        itertools.starmap(
+                            record.pack, batch  # pyright: ignore [reportArgumentType]
+                        )
+                    )
+                )
+        f.seek(0)
+
+    def read_run(f: IO[bytes]) -> Iterator[Any]:
+        if record is None:
+            while True:
+                try:
+                    yield from pickle.load(f)
+                except EOFError:
+                    return
+        else:
+            chunk_size = record.size * batch_size
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                records = record.iter_unpack(chunk)
+                yield from (map(itemgetter(0), records) if is_scalar else records)
+
+    def sorted_run(it: Iterator[Any]) -> list[Any]:
+        run = list(itertools.islice(it, run_size))
+        run.sort(key=key, reverse=reverse)
+        return run
+
+    def generator(it: Iterator[Any]) -> Iterator[Any]:
+        run = sorted_run(it)
+        if len(run) < run_size:
+            yield from run
+        else:
+            files: list[IO[bytes]] = []
+            try:
+                while run:
+                    files.append(TemporaryFile(dir=tmp_dir))
+                    write_run(run, files[-1])
+                    run = sorted_run(it)
+                yield from heapq.merge(*map(read_run, files), key=key, reverse=reverse)
+            finally:
+                for_each(lambda f: f.close(), files)
+
+    return generator(iter(iterable))
+
+
 @overload
 def partition(
     predicate: Callable[[T], bool], iterable: Iterable[T], lazy: Literal[True] = True
@@ -175,6 +406,44 @@ def partition(
         return lst1, lst2
 
 
+def sample(iterable: Iterable[T], k: int, seed: int | None = None) -> list[T]:
+    """
+    Picks `k` random elements in a single pass with O(k) memory,
+    like `random.sample(list(iterable), k)` but without materializing the input.
+    Returns every element when there are no more than `k` of them.
+
+    It's reservoir sampling with Li's "Algorithm L",
+    which skips over elements instead of drawing a random number for each.
+
+    Raises:
+        `ValueError`: If `k` is negative.
+    """
+    import random
+    from math import exp, floor, log, log1p
+
+    if k < 0:
+        raise ValueError("'k' must be greater than or equal to zero")
+    rng = random.Random(seed)
+
+    def uniform() -> float:
+        return rng.random() or 5e-324  # avoid `log(0)`
+
+    it = iter(iterable)
+    reservoir = list(itertools.islice(it, k))
+    if len(reservoir) < k or k == 0:
+        return reservoir
+
+    w = exp(log(uniform()) / k)
+    while True:
+        skip = floor(log(uniform()) / log1p(-w))
+        for ele in itertools.islice(it, skip, None):
+            reservoir[rng.randrange(k)] = ele
+            break
+        else:
+            return reservoir
+        w *= exp(log(uniform()) / k)
+
+
 def diff(a: Iterable[T], b: Iterable[T]) -> tuple[set[T], set[T], set[T]]:
     """
     Compute the differences and intersection between two iterables.
@@ -207,6 +476,79 @@ def diff(a: Iterable[T], b: Iterable[T]) -> tuple[set[T], set[T], set[T]]:
     return a_minus_b, b_minus_a, intersection
 
 
+DiffTag = Literal["left_only", "right_only", "both"]
+
+
+@overload
+def sorted_diff(
+    a: Iterable[C], b: Iterable[C], key: None = None
+) -> Iterator[tuple[DiffTag, C]]: ...
+@overload
+def sorted_diff(
+    a: Iterable[T], b: Iterable[T], key: Callable[[T], Comparable]
+) -> Iterator[tuple[DiffTag, T]]: ...
+
+
+def sorted_diff(
+    a: Iterable[Any], b: Iterable[Any], key: Callable[[Any], Comparable] | None = None
+) -> Iterator[tuple[DiffTag, Any]]:
+    """
+    A streaming version of `diff` for inputs already sorted by `key`,
+    merge-joining them lazily in O(1) memory.
+
+    Equal elements are paired one to one,
+    so a duplicated element only in `a` is reported as `"left_only"`.
+    For `"both"`, the element of `a` is yielded.
+
+    Parameters:
+        `a (Iterable[T])`: The first sorted iterable.
+        `b (Iterable[T])`: The second sorted iterable.
+        `key`: The key `a` and `b` are sorted by, defaults to the elements themselves.
+
+    Returns:
+        An iterator of `(tag, element)` pairs in sorted order,
+        where tag is `"left_only"`, `"right_only"` or `"both"`.
+
+    Example:
+        >>> list(sorted_diff([1, 2, 4], [2, 3]))
+        [('left_only', 1), ('both', 2), ('right_only', 3), ('left_only', 4)]
+    """
+    missing: Any = object()
+    key = (lambda ele: ele) if key is None else key
+    it_a, it_b = iter(a), iter(b)
+    x, y = next(it_a, missing), next(it_b, missing)
+    kx = missing if x is missing else key(x)
+    ky = missing if y is missing else key(y)
+
+    while x is not missing and y is not missing:
+        if kx < ky:
+            yield "left_only", x
+            x = next(it_a, missing)
+            kx = missing if x is missing else key(x)
+        elif ky < kx:
+            yield "right_only", y
+            y = next(it_b, missing)
+            ky = missing if y is missing else key(y)
+        else:
+            yield "both", x
+            x, y = next(it_a, missing), next(it_b, missing)
+            kx = missing if x is missing else key(x)
+            ky = missing if y is missing else key(y)
+
+    if x is not missing:
+        yield "left_only", x
+        for ele in it_a:
+            yield "left_only", ele
+    if y is not missing:
+        yield "right_only", y
+        for ele in it_b:
+            yield "right_only", ele
+
+
+def _is_present(arg: Any) -> bool:
+    return (not is_empty(arg)) if isinstance(arg, Iterable) else arg is not None
+
+
 def fallback(*args: Callable[[], Any]) -> Any:
     """
     Returns the first non-empty or non-None element in an iterable,
@@ -215,15 +557,61 @@ def fallback(*args: Callable[[], Any]) -> Any:
 
     from my_utils.stream import NoSuchElementException, Stream
 
-    def is_not_empty_or_none(arg: Any):
-        return (not is_empty(arg)) if isinstance(arg, Iterable) else arg is not None
-
     try:
-        return Stream(args).map(lambda arg: arg()).find(is_not_empty_or_none)
+        return Stream(args).map(lambda arg: arg()).find(_is_present)
     except NoSuchElementException:
         return None
 
 
+def race_fallback(*args: Callable[[], Any], executor: "Executor | None" = None) -> Any:
+    """
+    Like `fallback`, but all the functions start at once in `executor`,
+    which defaults to a thread pool with a worker per function.
+
+    Results are awaited in order, so the first non-empty or non-None one
+    is returned as soon as every function before it came back empty,
+    then the pending functions are cancelled.
+    An exception is raised only if it comes from a function awaited before that.
+
+    Example:
+        >>> race_fallback(
+        ...     lambda: query_slow_service(mime_type),
+        ...     lambda: read_local_config(mime_type),
+        ... )
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ThreadPoolExecutor(max(1, len(args))) if executor is None else executor
+    futures = [pool.submit(arg) for arg in args]
+    try:
+        for future in futures:
+            result = future.result()
+            if _is_present(result):
+                return result
+        return None
+    finally:
+        for future in futures:
+            future.cancel()
+        if executor is None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def arace_fallback(*args: Callable[[], Awaitable[Any]]) -> Any:
+    """An async version of `race_fallback`, where the functions start as tasks."""
+    import asyncio
+
+    tasks = [asyncio.ensure_future(arg()) for arg in args]
+    try:
+        for task in tasks:
+            result = await task
+            if _is_present(result):
+                return result
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 def cond(*args: tuple[Callable[[], bool], Callable[[], Any]]) -> Any:
     for condition, action in args:
         if condition():
@@ -264,15 +652,55 @@ async def abegin(*args: Callable[[], Any]) -> Any:
     return value
 
 
+_DIGITS = re.compile(r"(\d+)")
+
+
 def natsort(s: str) -> tuple[int | str, ...]:
-    import re
-
-    split_list: list[str] = re.split(r"(\d+)", s)
-    split_list.pop(0) if split_list[0] == "" else None
-    split_list.pop(-1) if len(split_list) > 0 and split_list[-1] == "" else None
-    return tuple(
-        map(
-            lambda text: int(text) if text.isdigit() else text,
-            split_list,
-        )
+    """
+    A natural sort key, splitting `s` into alternating text and number segments.
+
+    The key always starts with a (possibly empty) text segment,
+    so segments at the same position are both `str` or both `int`,
+    and keys of any two strings are comparable.
+
+    Example:
+        >>> natsort("track10.flac")
+        ('track', 10, '.flac')
+        >>> natsort("2a") < natsort("a1")
+        True
+    """
+    segments: list[Any] = _DIGITS.split(s)
+    segments[1::2] = map(int, segments[1::2])
+    return tuple(segments)
+
+
+@overload
+def natsorted(
+    iterable: Iterable[str], key: None = None, reverse: bool = False
+) -> list[str]: ...
+@overload
+def natsorted(
+    iterable: Iterable[T], key: Callable[[T], str], reverse: bool = False
+) -> list[T]: ...
+
+
+def natsorted(
+    iterable: Iterable[Any],
+    key: Callable[[Any], str] | None = None,
+    reverse: bool = False,
+) -> list[Any]:
+    """
+    Sorts `iterable` naturally, so "file2" comes before "file10".
+
+    Parameters:
+        `key`: Extracts the string to sort by from each element.
+
+    Example:
+        >>> natsorted(["file10", "file2", "File1"])
+        ['File1', 'file2', 'file10']
+    """
+    return sorted(
+        iterable,
+        key=natsort if key is None else lambda ele: natsort(key(ele)),
+        reverse=reverse,
     )
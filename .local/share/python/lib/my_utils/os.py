@@ -1,7 +1,8 @@
-from collections.abc import Callable
-from os import chdir, getcwd, stat
+from collections.abc import Callable, Iterator
+from os import chdir, fstat, getcwd, stat
 from pathlib import Path
 from stat import S_IMODE
+from typing import Any
 
 
 def slice_path(
@@ -22,10 +23,10 @@ def get_mime_type(
     # `.md` (with CJK character), `.ts`,
     # `.m4a`, `.tm`, `.xopp`, `.org`, `.scm`
 
-    from subprocess import run
-
     from xdg import Mime
 
+    from .proc import run
+
     def xdg_mime(file: Path) -> tuple[str, str]:
         mime = Mime.get_type2(file)
         return mime.media, mime.subtype  # pyright: ignore [reportAttributeAccessIssue]
@@ -108,6 +109,123 @@ def get_file_id(
     return hash_obj.hexdigest()
 
 
+def file_identity(file: str | Path, *args: Any, **kwargs: Any) -> tuple[Any, ...]:
+    """
+    A cache key of `file` as `(dev, inode, size, mtime_ns)`, followed by the other
+    arguments, so it changes whenever the file is replaced or modified in place.
+    """
+    stats = stat(file)
+    return (
+        stats.st_dev,
+        stats.st_ino,
+        stats.st_size,
+        stats.st_mtime_ns,
+        args,
+        tuple(kwargs.items()),
+    )
+
+
+def read_records(
+    file: str | Path, sep: bytes = b"\n", use_mmap: bool = True
+) -> Iterator[memoryview] | Iterator[bytes]:
+    """
+    Lazily splits a file by `sep`, the separators are not included,
+    and a trailing separator doesn't produce an empty last record.
+
+    With `use_mmap`, the file is memory-mapped and records are `memoryview` slices
+    of the mapping, so no record is copied until it's converted by the caller.
+    A slice kept after the iterator is exhausted keeps the mapping alive.
+    Otherwise the file is read in chunks and records are `bytes`.
+
+    Creating a `memoryview` costs about as much as copying a short `bytes`,
+    so the mapping pays off for long records, to count or scan a file
+    regardless of its records `read_chunks` is much faster.
+    """
+    if len(sep) == 0:
+        raise ValueError("'sep' must not be empty")
+
+    def mmap_generator() -> Iterator[memoryview]:
+        from mmap import ACCESS_READ, mmap
+
+        with open(file, "rb") as f:
+            if fstat(f.fileno()).st_size == 0:
+                return
+            mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+        view, start, end, len_sep = memoryview(mm), 0, len(mm), len(sep)
+        try:
+            while start < end:
+                stop = mm.find(sep, start)
+                if stop == -1:
+                    yield view[start:]
+                    return
+                yield view[start:stop]
+                start = stop + len_sep
+        finally:
+            try:
+                view.release()
+                mm.close()
+            except BufferError:  # slices are still referenced by the caller
+                pass
+
+    def read_generator() -> Iterator[bytes]:
+        # The pending record is kept as a list of chunks, and only a new chunk
+        # (with the `len(sep) - 1` bytes before it) is searched for `sep`,
+        # so a long record isn't copied and rescanned on every read
+        overlap = len(sep) - 1
+        with open(file, "rb") as f:
+            parts: list[bytes] = []
+            tail = b""
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                window = tail + chunk
+                if sep in window:
+                    *records, rest = b"".join((*parts, chunk)).split(sep)
+                    yield from records
+                    parts, window = [rest], rest
+                else:
+                    parts.append(chunk)
+                tail = window[len(window) - overlap :] if overlap > 0 else b""
+            rest = b"".join(parts)
+            if rest != b"":
+                yield rest
+
+    return mmap_generator() if use_mmap else read_generator()
+
+
+def read_chunks(
+    file: str | Path, size: int = 1 << 20, use_mmap: bool = True
+) -> Iterator[memoryview] | Iterator[bytes]:
+    """
+    Lazily reads a file by chunks of `size` bytes, the last one may be shorter.
+    With `use_mmap`, chunks are zero-copy `memoryview` slices of a mapping.
+    """
+    if size < 1:
+        raise ValueError("'size' must be at least 1")
+
+    def mmap_generator() -> Iterator[memoryview]:
+        from mmap import ACCESS_READ, mmap
+
+        with open(file, "rb") as f:
+            if fstat(f.fileno()).st_size == 0:
+                return
+            mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+        view = memoryview(mm)
+        try:
+            for start in range(0, len(mm), size):
+                yield view[start : start + size]
+        finally:
+            try:
+                view.release()
+                mm.close()
+            except BufferError:  # slices are still referenced by the caller
+                pass
+
+    def read_generator() -> Iterator[bytes]:
+        with open(file, "rb") as f:
+            yield from iter(lambda: f.read(size), b"")
+
+    return mmap_generator() if use_mmap else read_generator()
+
+
 def get_permission(file: str | Path):
     return S_IMODE(stat(file).st_mode)
 
@@ -0,0 +1,435 @@
+import functools
+import itertools
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from functools import partial
+from os import cpu_count
+from typing import Any, Literal, NamedTuple, TypeVar
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+ExecutorKind = Literal["thread", "process"]
+
+
+class Options(NamedTuple):
+    """Parallel settings carried along a `Stream` pipeline."""
+
+    workers: int | None = None
+    executor: ExecutorKind = "thread"
+    ordered: bool = True
+    chunksize: int = 1
+
+
+def check_options(workers: int | None, executor: ExecutorKind, chunksize: int) -> None:
+    if workers is not None and workers < 1:
+        raise ValueError("'workers' must be at least 1")
+    elif executor not in ("thread", "process"):
+        raise ValueError(f"Unknown executor kind: '{executor}'")
+    elif chunksize < 1:
+        raise ValueError("'chunksize' must be at least 1")
+
+
+def new_executor(
+    executor: ExecutorKind, workers: int | None = None
+) -> tuple[Executor, int]:
+    """Returns a fresh pool and the number of workers it runs."""
+    workers = (cpu_count() or 1) if workers is None else workers
+    return (
+        ThreadPoolExecutor(workers)
+        if executor == "thread"
+        else ProcessPoolExecutor(workers)
+    ), workers
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    it = iter(iterable)
+    return iter(lambda: list(itertools.islice(it, size)), [])
+
+
+def run_chunks(
+    chunk_fn: Callable[[list[T]], U],
+    iterable: Iterable[T],
+    workers: int | None = None,
+    executor: ExecutorKind = "thread",
+    ordered: bool = True,
+    chunksize: int = 1,
+) -> Iterator[U]:
+    """
+    Lazily applies `chunk_fn` to consecutive chunks of `iterable` in a pool.
+
+    At most `2 * workers` chunks are in flight at any time,
+    so the input is never materialized as a whole.
+    Pending work is cancelled when the returned iterator is closed early.
+
+    Parameters:
+        `chunk_fn`: Called with a list of at most `chunksize` elements,
+            it must be picklable when `executor` is `"process"`.
+        `ordered`: Whether results are yielded in submission order
+            or as soon as they complete.
+
+    Returns:
+        An iterator over the result of each chunk.
+    """
+    check_options(workers, executor, chunksize)
+
+    def generator() -> Iterator[U]:
+        pool, max_workers = new_executor(executor, workers)
+        max_in_flight = 2 * max_workers
+        try:
+            if ordered:
+                queue: deque[Future[U]] = deque()
+                for chunk in chunked(iterable, chunksize):
+                    if len(queue) >= max_in_flight:
+                        yield queue.popleft().result()
+                    queue.append(pool.submit(chunk_fn, chunk))
+                while queue:
+                    yield queue.popleft().result()
+            else:
+                pending: set[Future[U]] = set()
+                for chunk in chunked(iterable, chunksize):
+                    if len(pending) >= max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                    pending.add(pool.submit(chunk_fn, chunk))
+                for future in as_completed(pending):
+                    yield future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    return generator()
+
+
+# Chunk workers live at module level so that they can be pickled
+
+
+def _map_chunk(operation: Callable[[T], U], chunk: list[T]) -> list[U]:
+    return list(map(operation, chunk))
+
+
+def _filter_chunk(predicate: Callable[[T], bool], chunk: list[T]) -> list[T]:
+    return list(filter(predicate, chunk))
+
+
+def _flatmap_chunk(operation: Callable[[T], Iterable[U]], chunk: list[T]) -> list[U]:
+    return list(itertools.chain.from_iterable(map(operation, chunk)))
+
+
+def _for_each_chunk(operation: Callable[[T], Any], chunk: list[T]) -> None:
+    for ele in chunk:
+        operation(ele)
+
+
+def _reduce_chunk(
+    operation: Callable[[Any, T], Any], init: tuple[Any, ...], chunk: list[T]
+) -> Any:
+    return functools.reduce(operation, chunk, *init)
+
+
+def imap(
+    operation: Callable[[T], U],
+    iterable: Iterable[T],
+    workers: int | None = None,
+    executor: ExecutorKind = "thread",
+    ordered: bool = True,
+    chunksize: int = 1,
+) -> Iterator[U]:
+    """Like `map`, but `operation` runs in a thread or process pool."""
+    return itertools.chain.from_iterable(
+        run_chunks(
+            partial(_map_chunk, operation),
+            iterable,
+            workers,
+            executor,
+            ordered,
+            chunksize,
+        )
+    )
+
+
+def ifilter(
+    predicate: Callable[[T], bool],
+    iterable: Iterable[T],
+    workers: int | None = None,
+    executor: ExecutorKind = "thread",
+    ordered: bool = True,
+    chunksize: int = 1,
+) -> Iterator[T]:
+    """Like `filter`, but `predicate` runs in a thread or process pool."""
+    return itertools.chain.from_iterable(
+        run_chunks(
+            partial(_filter_chunk, predicate),
+            iterable,
+            workers,
+            executor,
+            ordered,
+            chunksize,
+        )
+    )
+
+
+def iflatmap(
+    operation: Callable[[T], Iterable[U]],
+    iterable: Iterable[T],
+    workers: int | None = None,
+    executor: ExecutorKind = "thread",
+    ordered: bool = True,
+    chunksize: int = 1,
+) -> Iterator[U]:
+    """Like `iters.flatmap`, but `operation` runs in a thread or process pool."""
+    return itertools.chain.from_iterable(
+        run_chunks(
+            partial(_flatmap_chunk, operation),
+            iterable,
+            workers,
+            executor,
+            ordered,
+            chunksize,
+        )
+    )
+
+
+def for_each(
+    operation: Callable[[T], Any],
+    iterable: Iterable[T],
+    workers: int | None = None,
+    executor: ExecutorKind = "thread",
+    ordered: bool = True,
+    chunksize: int = 1,
+) -> None:
+    """Like `iters.for_each`, but `operation` runs in a thread or process pool."""
+    deque(
+        run_chunks(
+            partial(_for_each_chunk, operation),
+            iterable,
+            workers,
+            executor,
+            ordered,
+            chunksize,
+        ),
+        maxlen=0,
+    )
+
+
+class _Failure(NamedTuple):
+    """An exception raised by the upstream of `prefetch`, to be re-raised downstream."""
+
+    exception: BaseException
+
+
+def prefetch(iterable: Iterable[T], n: int) -> Iterator[T]:
+    """
+    Pulls up to `n` elements of `iterable` ahead of the consumer in a background thread,
+    so the latency of producing them overlaps with the work done downstream.
+
+    Exceptions of the upstream are re-raised to the consumer in order,
+    and the thread stops once the returned iterator is closed or collected.
+
+    Raises:
+        `ValueError`: If `n` is less than 1.
+    """
+    if n < 1:
+        raise ValueError("'n' must be at least 1")
+
+    def generator() -> Iterator[T]:
+        from queue import Full, Queue
+        from threading import Event, Thread
+
+        buffer: Queue[Any] = Queue(n)
+        stop, end = Event(), object()
+
+        def put(item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            try:
+                for ele in iterable:
+                    if not put(ele):
+                        return
+            except BaseException as e:
+                put(_Failure(e))
+            else:
+                put(end)
+
+        Thread(target=produce, daemon=True).start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is end:
+                    return
+                elif isinstance(item, _Failure):
+                    raise item.exception
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+    return generator()
+
+
+def pipeline(
+    operation: Callable[[T], U],
+    iterable: Iterable[T],
+    workers: int = 1,
+    queue_size: int = 16,
+    ordered: bool = True,
+) -> Iterator[U]:
+    """
+    Runs `operation` as a pipeline stage in `workers` threads of its own,
+    fed by a thread pulling from `iterable`.
+
+    At most `queue_size + workers` elements are in flight between
+    the upstream and the consumer, so a slow consumer blocks this stage,
+    which in turn stops pulling from its upstream (back-pressure).
+    Chained stages thus run at the same time, each with its own worker count.
+
+    Exceptions of the upstream and of `operation` are re-raised to the consumer,
+    and the threads stop once the returned iterator is closed or collected.
+
+    Raises:
+        `ValueError`: If `workers` or `queue_size` is less than 1.
+    """
+    if workers < 1:
+        raise ValueError("'workers' must be at least 1")
+    elif queue_size < 1:
+        raise ValueError("'queue_size' must be at least 1")
+
+    def generator() -> Iterator[U]:
+        from queue import SimpleQueue
+        from threading import BoundedSemaphore, Event, Thread
+
+        inbound: SimpleQueue[Any] = SimpleQueue()
+        outbound: SimpleQueue[Any] = SimpleQueue()
+        slots = BoundedSemaphore(queue_size + workers)
+        stop, end = Event(), object()
+
+        def feed() -> None:
+            i = 0
+            try:
+                for ele in iterable:
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if stop.is_set():
+                        return
+                    inbound.put((i, ele))
+                    i += 1
+            except BaseException as e:
+                outbound.put((i, _Failure(e)))
+            finally:
+                for _ in range(workers):
+                    inbound.put(end)
+
+        def work() -> None:
+            while (item := inbound.get()) is not end:
+                i, ele = item
+                try:
+                    outbound.put((i, operation(ele)))
+                except BaseException as e:
+                    outbound.put((i, _Failure(e)))
+            outbound.put(end)
+
+        Thread(target=feed, daemon=True).start()
+        for _ in range(workers):
+            Thread(target=work, daemon=True).start()
+
+        pending: dict[int, Any] = {}
+        next_index, ends = 0, 0
+        try:
+            while True:
+                if ordered:
+                    while next_index in pending:
+                        result = pending.pop(next_index)
+                        next_index += 1
+                        if isinstance(result, _Failure):
+                            raise result.exception
+                        slots.release()
+                        yield result
+                if ends == workers:
+                    return
+                item = outbound.get()
+                if item is end:
+                    ends += 1
+                elif ordered:
+                    pending[item[0]] = item[1]
+                elif isinstance(item[1], _Failure):
+                    raise item[1].exception
+                else:
+                    slots.release()
+                    yield item[1]
+        finally:
+            stop.set()
+
+    return generator()
+
+
+def tree_combine(combine: Callable[[U, U], U], partials: list[U]) -> U:
+    """Combines neighbours pairwise until one value is left, keeping their order."""
+    while len(partials) > 1:
+        partials = [
+            (
+                combine(partials[i], partials[i + 1])
+                if i + 1 < len(partials)
+                else partials[i]
+            )
+            for i in range(0, len(partials), 2)
+        ]
+    return partials[0]
+
+
+def reduce(
+    operation: Callable[[Any, T], Any],
+    iterable: Iterable[T],
+    combine: Callable[[Any, Any], Any] | None = None,
+    init: tuple[Any, ...] = (),
+    workers: int | None = None,
+    executor: ExecutorKind = "process",
+    chunksize: int = 1024,
+) -> Any:
+    """
+    Like `functools.reduce`, but chunks of `iterable` are reduced in a pool,
+    then the partial results are combined pairwise as a tree.
+
+    Parameters:
+        `operation`: Folds an element into an accumulator.
+        `combine`: Merges two accumulators, defaults to `operation`.
+            Along with `operation`, it must be associative.
+        `init`: Either `()` or a 1-tuple of the initial accumulator of every chunk,
+            which must be an identity of `combine`.
+            With the `"thread"` executor it's shared by all chunks,
+            so it must not be mutated.
+
+    Raises:
+        `TypeError`: If `iterable` is empty and there is no `init`.
+    """
+    partials = list(
+        run_chunks(
+            partial(_reduce_chunk, operation, init),
+            iterable,
+            workers,
+            executor,
+            True,
+            chunksize,
+        )
+    )
+    if len(partials) == 0:
+        if len(init) == 0:
+            raise TypeError("reduce() of empty iterable with no initial value")
+        return init[0]
+    return tree_combine(operation if combine is None else combine, partials)
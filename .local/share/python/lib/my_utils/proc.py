@@ -0,0 +1,158 @@
+"""
+Subprocess calls with telemetry.
+
+When `$MY_UTILS_PROC_TRACE` names a file, every call of `run` and `aio.run`
+appends a JSON line with the script, the tool (`argv[0]`), the spawn latency,
+the wall time, the exit code and the size of the captured stdout.
+Summarize it with `python -m my_utils.proc report TRACE`.
+"""
+
+import json
+import sys
+from collections.abc import Sequence
+from os import PathLike, getenv, getpid
+from os.path import basename
+from subprocess import PIPE, CalledProcessError, CompletedProcess, Popen
+from time import perf_counter_ns, time
+from typing import Any
+
+TRACE_ENV = "MY_UTILS_PROC_TRACE"
+
+Command = Sequence[str | PathLike[str]]
+
+
+def record(
+    cmd: Command,
+    spawn_ns: int,
+    wall_ns: int,
+    returncode: int | None,
+    stdout: str | bytes | None,
+) -> None:
+    """Appends a call to the trace, if `$MY_UTILS_PROC_TRACE` is set."""
+    trace = getenv(TRACE_ENV)
+    if not trace:
+        return
+    entry = {
+        "time": time(),
+        "pid": getpid(),
+        "script": basename(sys.argv[0]),
+        "tool": basename(cmd[0]),
+        "spawn": spawn_ns / 1e9,
+        "wall": wall_ns / 1e9,
+        "exit": returncode,
+        "stdout_bytes": (
+            None
+            if stdout is None
+            else len(stdout.encode() if isinstance(stdout, str) else stdout)
+        ),
+    }
+    # a single write of a line in append mode, so concurrent processes don't interleave
+    try:
+        with open(trace, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError:  # the trace is best-effort, it never fails the call
+        pass
+
+
+def run(
+    cmd: Command,
+    input: str | bytes | None = None,
+    capture_output: bool = False,
+    timeout: float | None = None,
+    check: bool = False,
+    **kwargs: Any,
+) -> CompletedProcess[Any]:
+    """
+    Like `subprocess.run`, but the call is recorded to the trace.
+
+    Raises:
+        `subprocess.CalledProcessError`: If `check` and the exit code isn't zero.
+        `subprocess.TimeoutExpired`: If the command runs longer than `timeout`.
+    """
+    if input is not None:
+        kwargs["stdin"] = PIPE
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = PIPE
+
+    start = perf_counter_ns()
+    with Popen(cmd, **kwargs) as p:
+        spawn = perf_counter_ns() - start
+        try:
+            stdout, stderr = p.communicate(
+                input, timeout=timeout  # pyright: ignore [reportArgumentType]
+            )
+        except BaseException:
+            p.kill()
+            record(cmd, spawn, perf_counter_ns() - start, None, None)
+            raise
+    record(cmd, spawn, perf_counter_ns() - start, p.returncode, stdout)
+
+    if check and p.returncode != 0:
+        raise CalledProcessError(p.returncode, p.args, stdout, stderr)
+    return CompletedProcess(p.args, p.returncode, stdout, stderr)
+
+
+def report(trace: str | PathLike[str], top: int = 10) -> str:
+    """
+    Summarizes a trace per script, listing its `top` tools by total wall time
+    with their count, p50, p99 and max wall time and mean spawn latency.
+    """
+    from my_utils.profiling import LatencyHistogram
+
+    walls: dict[tuple[str, str], LatencyHistogram] = {}
+    spawns: dict[tuple[str, str], int] = {}
+    failures: dict[tuple[str, str], int] = {}
+    with open(trace) as f:
+        for line in f:
+            entry = json.loads(line)
+            k = (entry["script"], entry["tool"])
+            walls.setdefault(k, LatencyHistogram()).record(round(entry["wall"] * 1e9))
+            spawns[k] = spawns.get(k, 0) + round(entry["spawn"] * 1e9)
+            failures[k] = failures.get(k, 0) + (entry["exit"] != 0)
+
+    lines: list[str] = []
+    for script in sorted({script for script, _ in walls}):
+        tools = sorted(
+            (k for k in walls if k[0] == script), key=lambda k: -walls[k].total
+        )
+        lines.append(f"{script}")
+        lines.append(
+            f"  {'tool':<20} {'calls':>7} {'failed':>6} {'spawn ms':>9} "
+            f"{'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'total ms':>10}"
+        )
+        for k in tools[:top]:
+            h = walls[k]
+            lines.append(
+                f"  {k[1]:<20} {h.count:>7} {failures[k]:>6} "
+                f"{spawns[k] / h.count / 1e6:>9.3f} {h.percentile(50) / 1e6:>9.3f} "
+                f"{h.percentile(99) / 1e6:>9.3f} {h.max / 1e6:>9.3f} "
+                f"{h.total / 1e6:>10.3f}"
+            )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Summarize a subprocess trace")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser(
+        "report", help="list the slowest tools per script"
+    )
+    report_parser.add_argument(
+        "trace",
+        nargs="?",
+        default=getenv(TRACE_ENV),
+        help=f"the JSONL trace (default: ${TRACE_ENV})",
+    )
+    report_parser.add_argument(
+        "-n", "--top", type=int, default=10, help="tools per script (default: 10)"
+    )
+    args = parser.parse_args()
+    if args.trace is None:
+        parser.error(f"no trace given and ${TRACE_ENV} is not set")
+    print(report(args.trace, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Per-stage profiling of `Stream` pipelines, see `stream_profiler`,
+and per-function latency histograms, see `fntools.timed`.
+"""
+
+import json
+import sys
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from time import perf_counter
+from typing import Any, TextIO, TypeVar
+
+T = TypeVar("T")
+
+# Stages holding elements back, their buffer is `elements in - elements out`
+BUFFERING = frozenset(("drop_last", "nwise", "tee", "partition", "sorted"))
+# Stages buffering exactly what they emit
+BUFFERING_OUTPUT = frozenset(("take_last", "top_k"))
+
+
+class StageStats:
+    def __init__(
+        self,
+        profiler: "StreamProfiler",
+        index: int,
+        name: str,
+        upstream: "StageStats | None",
+        construct_time: float,
+    ) -> None:
+        self.profiler = profiler
+        self.index = index
+        self.name = name
+        self.upstream = upstream
+        self.count_out = 0
+        self.construct_time = construct_time
+        self.next_time = 0.0
+        self.peak_buffered = 0
+        # When the stage reading from this one started being built
+        self.downstream_started = 0.0
+
+    def observe_buffer(self) -> None:
+        if self.upstream is not None and self.name in BUFFERING:
+            self.peak_buffered = max(
+                self.peak_buffered, self.upstream.count_out - self.count_out
+            )
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        `self_time` is the time of the stage minus the time of its upstream,
+        it covers both the user callables and the iterator machinery,
+        plus any eager work done when the stage is built (like `sorted`).
+        """
+        total = self.construct_time + self.next_time
+        upstream_time = 0.0 if self.upstream is None else self.upstream.next_time
+        return {
+            "index": self.index,
+            "stage": self.name,
+            "upstream": None if self.upstream is None else self.upstream.index,
+            "in": None if self.upstream is None else self.upstream.count_out,
+            "out": self.count_out,
+            "self_time": max(0.0, total - upstream_time),
+            "total_time": total,
+            "peak_buffered": (
+                self.peak_buffered
+                if self.name in BUFFERING
+                else self.count_out if self.name in BUFFERING_OUTPUT else None
+            ),
+        }
+
+
+class ProfiledIterator(Iterator[T]):
+    """Counts and times every element pulled through a stage."""
+
+    def __init__(self, iterator: Iterator[T], stats: StageStats) -> None:
+        self.__iterator = iterator
+        self.__stats = stats
+
+    def __next__(self) -> T:
+        stats = self.__stats
+        start = perf_counter()
+        try:
+            ele = next(self.__iterator)
+        finally:
+            stats.next_time += perf_counter() - start
+        stats.count_out += 1
+        stats.observe_buffer()
+        return ele
+
+
+class StreamProfiler:
+    def __init__(self, name: str = "stream") -> None:
+        self.name = name
+        self.stages: list[StageStats] = []
+
+    def new_stage(
+        self, name: str, upstream: StageStats | None, construct_time: float = 0.0
+    ) -> StageStats:
+        stats = StageStats(self, len(self.stages), name, upstream, construct_time)
+        self.stages.append(stats)
+        return stats
+
+    def report(self) -> list[dict[str, Any]]:
+        return [stats.to_dict() for stats in self.stages]
+
+    def format(self) -> str:
+        def cell(value: Any) -> str:
+            return "-" if value is None else str(value)
+
+        lines = [
+            f"stream profile: {self.name}",
+            f"{'#':>3} {'stage':<18} {'from':>4} {'in':>10} {'out':>10} "
+            f"{'self ms':>10} {'total ms':>10} {'peak buf':>9}",
+        ]
+        for r in self.report():
+            lines.append(
+                f"{r['index']:>3} {r['stage']:<18} {cell(r['upstream']):>4} "
+                f"{cell(r['in']):>10} {r['out']:>10} "
+                f"{r['self_time'] * 1e3:>10.3f} {r['total_time'] * 1e3:>10.3f} "
+                f"{cell(r['peak_buffered']):>9}"
+            )
+        return "\n".join(lines)
+
+
+_active: ContextVar[StreamProfiler | None] = ContextVar("stream_profiler", default=None)
+_enabled_lock = threading.Lock()
+# The number of open `stream_profiler` blocks in any thread or task,
+# checked by `Stream` before the slower lookup of `active`
+enabled = 0
+
+
+def active() -> StreamProfiler | None:
+    return _active.get()
+
+
+@contextmanager
+def stream_profiler(
+    name: str = "stream",
+    output: str | Path | None = None,
+    file: TextIO = sys.stderr,
+) -> Iterator[StreamProfiler]:
+    """
+    Records every `Stream` stage built inside the block,
+    then prints a report to `file`, or writes it as JSON to `output`.
+
+    For each stage it records the number of elements in and out,
+    the time spent in the stage itself and for
+    `take_last`, `drop_last`, `nwise`, `tee`, `partition`, `sorted` and `top_k`
+    the peak number of buffered elements.
+    Pipelines should be consumed inside the block to be fully accounted.
+
+    Example:
+        >>> with stream_profiler("squares"):
+        ...     Stream.range(1000).map(lambda x: x * x).sorted().take_last(3).to_list()
+    """
+    global enabled
+
+    profiler = StreamProfiler(name)
+    token = _active.set(profiler)
+    with _enabled_lock:
+        enabled += 1
+    try:
+        yield profiler
+    finally:
+        with _enabled_lock:
+            enabled -= 1
+        _active.reset(token)
+        if output is None:
+            print(profiler.format(), file=file)
+        else:
+            with open(output, "w") as f:
+                json.dump({"name": name, "stages": profiler.report()}, f, indent=2)
+
+
+class LatencyHistogram:
+    """
+    An HDR-style histogram of nanosecond latencies, with 16 linear buckets
+    per power of two, so a reported percentile is within 6.25% of the exact one.
+    """
+
+    SUB_BITS = 4
+
+    def __init__(self) -> None:
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @classmethod
+    def bucket_of(cls, ns: int) -> int:
+        shift = ns.bit_length() - cls.SUB_BITS - 1
+        return ns if shift <= 0 else (shift << cls.SUB_BITS) + (ns >> shift)
+
+    @classmethod
+    def value_of(cls, bucket: int) -> int:
+        """The middle of the range of values falling in `bucket`."""
+        shift = (bucket >> cls.SUB_BITS) - 1
+        if shift <= 0:
+            return bucket
+        lower = (bucket - (shift << cls.SUB_BITS)) << shift
+        return lower + (1 << (shift - 1))
+
+    def record(self, ns: int) -> None:
+        b = self.bucket_of(ns)
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for b, n in dict(other.buckets).items():
+            self.buckets[b] = self.buckets.get(b, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> int:
+        """The latency in nanoseconds that `q` percent of the calls don't exceed."""
+        if self.count == 0:
+            return 0
+        rank, seen = q / 100 * self.count, 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= rank:
+                return min(self.value_of(b), self.max)
+        return self.max
+
+    def to_dict(self) -> dict[str, Any]:
+        """Latencies are in seconds, `buckets` allows merging dumps of processes."""
+        return {
+            "count": self.count,
+            "mean": 0.0 if self.count == 0 else self.total / self.count / 1e9,
+            "p50": self.percentile(50) / 1e9,
+            "p90": self.percentile(90) / 1e9,
+            "p99": self.percentile(99) / 1e9,
+            "max": self.max / 1e9,
+            "total": self.total / 1e9,
+            "buckets": {str(b): n for b, n in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.buckets = {int(b): n for b, n in d["buckets"].items()}
+        histogram.count = d["count"]
+        histogram.total = round(d["total"] * 1e9)
+        histogram.max = round(d["max"] * 1e9)
+        return histogram
+
+
+TIMINGS_ENV = "MY_UTILS_TIMINGS"
+
+# Every thread records into histograms of its own without locking,
+# the lock only guards the registration of a new one
+_histograms: list[tuple[str, LatencyHistogram]] = []
+_histograms_lock = threading.Lock()
+_local = threading.local()
+
+
+def histogram(name: str) -> LatencyHistogram:
+    """The histogram of `name` for the current thread."""
+    mine: dict[str, LatencyHistogram] | None = getattr(_local, "histograms", None)
+    if mine is None:
+        mine = _local.histograms = {}
+    h = mine.get(name)
+    if h is None:
+        h = mine[name] = LatencyHistogram()
+        with _histograms_lock:
+            if len(_histograms) == 0:
+                _register_dump()
+            _histograms.append((name, h))
+    return h
+
+
+def timings() -> dict[str, LatencyHistogram]:
+    """The histograms of every thread merged by name."""
+    merged: dict[str, LatencyHistogram] = {}
+    with _histograms_lock:
+        for name, h in _histograms:
+            merged.setdefault(name, LatencyHistogram()).merge(h)
+    return merged
+
+
+def format_timings(histograms: dict[str, LatencyHistogram]) -> str:
+    lines = [
+        f"{'function':<40} {'count':>8} {'p50 ms':>9} {'p90 ms':>9} "
+        f"{'p99 ms':>9} {'max ms':>9} {'total ms':>10}"
+    ]
+    for name, h in sorted(histograms.items(), key=lambda item: -item[1].total):
+        r = h.to_dict()
+        lines.append(
+            f"{name:<40} {r['count']:>8} {r['p50'] * 1e3:>9.3f} {r['p90'] * 1e3:>9.3f} "
+            f"{r['p99'] * 1e3:>9.3f} {r['max'] * 1e3:>9.3f} {r['total'] * 1e3:>10.3f}"
+        )
+    return "\n".join(lines)
+
+
+def dump_timings(sink: str) -> None:
+    """
+    Prints the timings to stderr if `sink` is `"stderr"`,
+    otherwise appends them as a JSON line to the file `sink`,
+    so the dumps of many short-lived processes can be merged by `load_timings`.
+    """
+    histograms = timings()
+    if len(histograms) == 0:
+        return
+    elif sink == "stderr":
+        print(format_timings(histograms), file=sys.stderr)
+    else:
+        from os import getpid
+
+        record = {
+            "pid": getpid(),
+            "argv": sys.argv,
+            "timings": {name: h.to_dict() for name, h in histograms.items()},
+        }
+        with open(sink, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_timings(files: Iterable[str | Path]) -> dict[str, LatencyHistogram]:
+    merged: dict[str, LatencyHistogram] = {}
+    for file in files:
+        with open(file) as f:
+            for line in f:
+                for name, d in json.loads(line)["timings"].items():
+                    merged.setdefault(name, LatencyHistogram()).merge(
+                        LatencyHistogram.from_dict(d)
+                    )
+    return merged
+
+
+def _register_dump() -> None:
+    from os import getenv
+
+    sink = getenv(TIMINGS_ENV)
+    if sink:
+        import atexit
+
+        atexit.register(dump_timings, sink)
+
+
+if __name__ == "__main__":
+    # python -m my_utils.profiling TIMINGS.jsonl...
+    print(format_timings(load_timings(sys.argv[1:])))
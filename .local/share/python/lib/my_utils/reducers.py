@@ -0,0 +1,264 @@
+"""
+Single-pass folds which can be combined by `Stream.aggregate_by`
+and `Stream.collect_many`.
+
+Each builtin is a factory that takes an optional `value` function
+to extract the aggregated value from an element.
+"""
+
+from collections.abc import Callable, Hashable, Iterable, Mapping
+from typing import Any, NamedTuple, TypeVar
+
+T = TypeVar("T")
+H = TypeVar("H", bound=Hashable)
+
+
+class _Missing:
+    """The accumulator of a reducer which hasn't seen any element."""
+
+    pass
+
+
+class Reducer(NamedTuple):
+    """A fold computed as `finish(step(...step(init(), e1)..., en))`."""
+
+    init: Callable[[], Any]
+    step: Callable[[Any, Any], Any]
+    finish: Callable[[Any], Any] = lambda acc: acc
+
+
+ReducerLike = Reducer | str | Callable[[], Reducer]
+
+
+def count() -> Reducer:
+    return Reducer(int, lambda acc, _: acc + 1)
+
+
+def sum(value: Callable[[Any], Any] | None = None) -> Reducer:
+    return Reducer(
+        int,
+        (
+            (lambda acc, ele: acc + ele)
+            if value is None
+            else (lambda acc, ele: acc + value(ele))
+        ),
+    )
+
+
+def min(value: Callable[[Any], Any] | None = None) -> Reducer:
+    def step(acc: Any, ele: Any) -> Any:
+        ele = ele if value is None else value(ele)
+        return ele if acc is _Missing or ele < acc else acc
+
+    return Reducer(lambda: _Missing, step, lambda acc: None if acc is _Missing else acc)
+
+
+def max(value: Callable[[Any], Any] | None = None) -> Reducer:
+    def step(acc: Any, ele: Any) -> Any:
+        ele = ele if value is None else value(ele)
+        return ele if acc is _Missing or acc < ele else acc
+
+    return Reducer(lambda: _Missing, step, lambda acc: None if acc is _Missing else acc)
+
+
+def mean(value: Callable[[Any], Any] | None = None) -> Reducer:
+    def step(acc: list[Any], ele: Any) -> list[Any]:
+        acc[0] += ele if value is None else value(ele)
+        acc[1] += 1
+        return acc
+
+    return Reducer(
+        lambda: [0, 0],
+        step,
+        lambda acc: None if acc[1] == 0 else acc[0] / acc[1],
+    )
+
+
+def first(value: Callable[[Any], Any] | None = None) -> Reducer:
+    return Reducer(
+        lambda: _Missing,
+        lambda acc, ele: (
+            acc if acc is not _Missing else (ele if value is None else value(ele))
+        ),
+        lambda acc: None if acc is _Missing else acc,
+    )
+
+
+def last(value: Callable[[Any], Any] | None = None) -> Reducer:
+    return Reducer(
+        lambda: _Missing,
+        lambda _, ele: ele if value is None else value(ele),
+        lambda acc: None if acc is _Missing else acc,
+    )
+
+
+def to_list(value: Callable[[Any], Any] | None = None) -> Reducer:
+    def step(acc: list[Any], ele: Any) -> list[Any]:
+        acc.append(ele if value is None else value(ele))
+        return acc
+
+    return Reducer(list, step)
+
+
+def to_set(value: Callable[[Any], Any] | None = None) -> Reducer:
+    def step(acc: set[Any], ele: Any) -> set[Any]:
+        acc.add(ele if value is None else value(ele))
+        return acc
+
+    return Reducer(set, step)
+
+
+def counter(value: Callable[[Any], Any] | None = None) -> Reducer:
+    from collections import Counter
+
+    def step(acc: Counter[Any], ele: Any) -> Counter[Any]:
+        acc[ele if value is None else value(ele)] += 1
+        return acc
+
+    return Reducer(Counter, step)
+
+
+def sample(k: int, seed: int | None = None) -> Reducer:
+    """
+    Keeps `k` random elements by reservoir sampling (Algorithm R),
+    reducers made by one call share a random generator seeded by `seed`.
+    """
+    import random
+
+    if k < 0:
+        raise ValueError("'k' must be greater than or equal to zero")
+    rng = random.Random(seed)
+
+    def step(acc: list[Any], ele: Any) -> list[Any]:
+        reservoir, acc[1] = acc[0], acc[1] + 1
+        if len(reservoir) < k:
+            reservoir.append(ele)
+        else:
+            i = rng.randrange(acc[1])
+            if i < k:
+                reservoir[i] = ele
+        return acc
+
+    return Reducer(lambda: [[], 0], step, lambda acc: acc[0])
+
+
+def combine(reducers: Mapping[str, ReducerLike]) -> Reducer:
+    """Runs several reducers side by side, the result is a dict keyed like `reducers`."""
+    names = tuple(reducers)
+    folds = tuple(map(resolve, reducers.values()))
+
+    def step(acc: list[Any], ele: Any) -> list[Any]:
+        for i, fold in enumerate(folds):
+            acc[i] = fold.step(acc[i], ele)
+        return acc
+
+    return Reducer(
+        lambda: [fold.init() for fold in folds],
+        step,
+        lambda acc: {
+            name: fold.finish(value) for name, fold, value in zip(names, folds, acc)
+        },
+    )
+
+
+def group_by(
+    key: Callable[[Any], Hashable], reducer: ReducerLike | Mapping[str, ReducerLike]
+) -> Reducer:
+    """A reducer version of `aggregate_by`, to be nested in other reducers."""
+    init, step, finish = (
+        combine(reducer) if isinstance(reducer, Mapping) else resolve(reducer)
+    )
+
+    def group_step(acc: dict[Hashable, Any], ele: Any) -> dict[Hashable, Any]:
+        k = key(ele)
+        acc[k] = step(acc[k] if k in acc else init(), ele)
+        return acc
+
+    return Reducer(dict, group_step, lambda acc: {k: finish(v) for k, v in acc.items()})
+
+
+BUILTINS: dict[str, Callable[[], Reducer]] = {
+    "count": count,
+    "sum": sum,
+    "min": min,
+    "max": max,
+    "mean": mean,
+    "first": first,
+    "last": last,
+    "to_list": to_list,
+    "to_set": to_set,
+    "counter": counter,
+}
+
+
+def resolve(reducer: ReducerLike) -> Reducer:
+    """Accepts a `Reducer`, the name of a builtin one, or a factory like `to_list`."""
+    if isinstance(reducer, Reducer):
+        return reducer
+    elif isinstance(reducer, str):
+        if reducer in BUILTINS:
+            return BUILTINS[reducer]()
+        else:
+            raise ValueError(f"Unknown reducer: '{reducer}'")
+    else:
+        return reducer()
+
+
+def fold(iterable: Iterable[T], reducer: ReducerLike) -> Any:
+    init, step, finish = resolve(reducer)
+    acc = init()
+    for ele in iterable:
+        acc = step(acc, ele)
+    return finish(acc)
+
+
+def collect_many(
+    iterable: Iterable[T], reducers: Mapping[str, ReducerLike]
+) -> dict[str, Any]:
+    """
+    Feeds every element to several reducers in a single pass,
+    so a one-shot iterator is aggregated without being buffered or reread.
+
+    Example:
+        >>> collect_many(
+        ...     ["a.py", "b.md", "c.py"],
+        ...     {"n": "count", "by_ext": group_by(lambda f: f[-2:], "count")},
+        ... )
+        {'n': 3, 'by_ext': {'py': 2, 'md': 1}}
+    """
+    return fold(iterable, combine(reducers))
+
+
+def aggregate_by(
+    iterable: Iterable[T],
+    key: Callable[[T], H],
+    reducer: ReducerLike | Mapping[str, ReducerLike],
+) -> dict[H, Any]:
+    """
+    Groups elements by `key` with a dict and folds each group in a single pass.
+
+    Unlike `itertools.groupby`, the input doesn't need to be sorted,
+    it takes O(n) time and O(groups) memory.
+
+    Parameters:
+        `key`: A function computing the group of each element.
+        `reducer`: A `Reducer`, the name of a builtin one,
+            or a mapping from names to either of them.
+
+    Returns:
+        A dict from each key to the result of `reducer`,
+        or to a dict of results when `reducer` is a mapping.
+
+    Example:
+        >>> aggregate_by(["a", "bb", "cc"], len, {"n": "count", "last": "last"})
+        {1: {'n': 1, 'last': 'a'}, 2: {'n': 2, 'last': 'cc'}}
+    """
+    init, step, finish = (
+        combine(reducer) if isinstance(reducer, Mapping) else resolve(reducer)
+    )
+
+    accs: dict[H, Any] = {}
+    for ele in iterable:
+        k = key(ele)
+        accs[k] = step(accs[k] if k in accs else init(), ele)
+    return {k: finish(acc) for k, acc in accs.items()}
@@ -0,0 +1,183 @@
+"""Fixed-memory probabilistic summaries of streams."""
+
+import heapq
+import itertools
+from array import array
+from collections.abc import Hashable, Iterator
+from math import ceil, log
+
+_MASK64 = (1 << 64) - 1
+
+
+def hash64(key: Hashable) -> int:
+    """
+    A 64-bit hash, the BLAKE2b digest of `str`, `bytes` and `int` keys,
+    so they never collide systematically and hash the same in every process.
+
+    Other keys mix the builtin `hash` with the splitmix64 finalizer,
+    so keys sharing a builtin hash always collide,
+    like `(-1,)` and `(-2,)` or `-1.0` and `-2.0` (CPython reserves `-1`),
+    and `str` inside them are salted per process.
+    """
+    from hashlib import blake2b
+
+    # The first byte tags the type, so `"a"` and `b"a"` differ
+    if isinstance(key, str):
+        data = b"s" + key.encode("utf-8", "surrogatepass")
+    elif isinstance(key, bytes):
+        data = b"b" + key
+    elif isinstance(key, int):
+        data = b"i" + key.to_bytes((key.bit_length() + 8) // 8, "little", signed=True)
+    else:
+        z = (hash(key) + 0x9E3779B97F4A7C15) & _MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return z ^ (z >> 31)
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "little")
+
+
+class BloomFilter:
+    """
+    A set membership sketch in a `bytearray` of bits,
+    which may report false positives but never false negatives.
+
+    Parameters:
+        `capacity`: Expected number of distinct keys.
+        `error_rate`: Tolerated false positive rate when `capacity` is reached.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        if capacity < 1:
+            raise ValueError("'capacity' must be at least 1")
+        elif not 0 < error_rate < 1:
+            raise ValueError("'error_rate' must be between 0 and 1")
+        self.size = ceil(-capacity * log(error_rate) / log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def __indices(self, key: Hashable) -> list[int]:
+        # Double hashing, see Kirsch and Mitzenmacher, "Less Hashing, Same Performance"
+        h = hash64(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, key: Hashable) -> bool:
+        bits = self.bits
+        return all(bits[i >> 3] & (1 << (i & 7)) for i in self.__indices(key))
+
+    def add(self, key: Hashable) -> bool:
+        """Adds `key` and returns whether it was definitely not present before."""
+        bits, is_new = self.bits, False
+        for i in self.__indices(key):
+            byte, mask = i >> 3, 1 << (i & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                is_new = True
+        return is_new
+
+
+class HyperLogLog:
+    """
+    A cardinality sketch of `2 ** precision` one-byte registers,
+    its standard error is about `1.04 / sqrt(2 ** precision)`.
+    """
+
+    def __init__(self, precision: int = 14) -> None:
+        if not 4 <= precision <= 18:
+            raise ValueError("'precision' must be between 4 and 18")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key: Hashable) -> None:
+        h, p = hash64(key), self.precision
+        index, rest = h >> (64 - p), h & ((1 << (64 - p)) - 1)
+        rank = 64 - p - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Folds `other` into this sketch, both must share the same precision."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def __len__(self) -> int:
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * log(m / zeros)  # linear counting for small cardinalities
+        return round(estimate)
+
+
+class SpaceSaving:
+    """
+    Tracks the `capacity` most frequent keys with the Space-Saving algorithm.
+
+    A new key evicts the least counted one and inherits its count,
+    so counts are overestimated by at most `errors[key]`,
+    and any key occurring more than `n / capacity` times is guaranteed to be kept.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("'capacity' must be at least 1")
+        self.capacity = capacity
+        self.counts: dict[Hashable, int] = {}
+        self.errors: dict[Hashable, int] = {}
+        # One `(count, seq, key)` entry per tracked key,
+        # its count may lag behind `counts` and is refreshed lazily on eviction
+        self.__heap: list[tuple[int, int, Hashable]] = []
+        self.__seq = itertools.count()
+
+    def add(self, key: Hashable) -> None:
+        counts, heap = self.counts, self.__heap
+        if key in counts:
+            counts[key] += 1
+        elif len(counts) < self.capacity:
+            counts[key], self.errors[key] = 1, 0
+            heapq.heappush(heap, (1, next(self.__seq), key))
+        else:
+            count, _, victim = heap[0]
+            while counts[victim] != count:
+                heapq.heapreplace(heap, (counts[victim], next(self.__seq), victim))
+                count, _, victim = heap[0]
+            del counts[victim], self.errors[victim]
+            counts[key], self.errors[key] = count + 1, count
+            heapq.heapreplace(heap, (count + 1, next(self.__seq), key))
+
+    def most_common(self, n: int | None = None) -> list[tuple[Hashable, int]]:
+        """Like `collections.Counter.most_common`, but counts are upper bounds."""
+        return (
+            sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+            if n is None
+            else heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+        )
+
+
+class CountMinSketch:
+    """
+    Approximate frequencies in a `depth` by `width` table of counters.
+
+    An estimate never undercounts, it overcounts by at most `e * n / width`
+    with probability `1 - exp(-depth)`, where `n` is the total count.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 5) -> None:
+        if width < 1 or depth < 1:
+            raise ValueError("'width' and 'depth' must be at least 1")
+        self.width, self.depth = width, depth
+        self.rows = [array("Q", bytes(8 * width)) for _ in range(depth)]
+
+    def __indices(self, key: Hashable) -> Iterator[int]:
+        h = hash64(key)
+        h1, h2, width = h & 0xFFFFFFFF, (h >> 32) | 1, self.width
+        return map(lambda i: (h1 + i * h2) % width, range(self.depth))
+
+    def add(self, key: Hashable, count: int = 1) -> None:
+        for row, i in zip(self.rows, self.__indices(key)):
+            row[i] += count
+
+    def __getitem__(self, key: Hashable) -> int:
+        return min(map(lambda row, i: row[i], self.rows, self.__indices(key)))
@@ -2,27 +2,34 @@
 
 from __future__ import annotations
 
+import heapq
 import itertools
 import operator
 from collections import Counter, deque
-from collections.abc import Callable, Hashable, Iterable, Iterator
-from functools import reduce
-from typing import Any, Generic, Literal, Protocol, TypeVar, final, overload
-
-from my_utils import iters
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+)
+from functools import partial, reduce
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Generic, Literal, TypeVar, final, overload
+
+from my_utils import iters, parallel, profiling, reducers, sketch
+from my_utils.iters import C
 
 T = TypeVar("T")
 U1 = TypeVar("U1")
 U2 = TypeVar("U2")
 
 
-class Comparable(Protocol):
-    def __lt__(self, __other) -> bool: ...
-    def __eq__(self, __other: object) -> bool: ...
-
-
 H = TypeVar("H", bound=Hashable)
-C = TypeVar("C", bound=Comparable)
 
 
 class NoSuchElementException(Exception):
@@ -111,6 +118,50 @@ class __StrictClassMethodOfStream(type):
             else cls(iter(operation, stop_value))
         )
 
+    @overload
+    def lines(
+        cls, path: str | Path, mmap: bool = True, encoding: None = None
+    ) -> Stream[memoryview] | Stream[bytes]: ...
+    @overload
+    def lines(
+        cls, path: str | Path, mmap: bool = True, *, encoding: str
+    ) -> Stream[str]: ...
+
+    def lines(
+        cls, path: str | Path, mmap: bool = True, encoding: str | None = None
+    ) -> Stream[memoryview] | Stream[bytes] | Stream[str]:
+        """
+        Streams the lines of a file without line endings.
+
+        With `mmap`, lines are zero-copy `memoryview` slices of a memory-mapped file,
+        otherwise they are `bytes`.
+        They're only decoded to `str` when `encoding` is given.
+        """
+        from my_utils.os import read_records
+
+        records = read_records(path, b"\n", mmap)
+        return (
+            cls(records)
+            if encoding is None
+            else cls(map(lambda record: str(record, encoding), records))
+        )
+
+    def records(
+        cls, path: str | Path, sep: bytes = b"\n", mmap: bool = True
+    ) -> Stream[memoryview] | Stream[bytes]:
+        """Streams the `sep`-separated records of a file, see `my_utils.os.read_records`."""
+        from my_utils.os import read_records
+
+        return cls(read_records(path, sep, mmap))
+
+    def chunks(
+        cls, path: str | Path, size: int = 1 << 20, mmap: bool = True
+    ) -> Stream[memoryview] | Stream[bytes]:
+        """Streams a file by chunks of `size` bytes, see `my_utils.os.read_chunks`."""
+        from my_utils.os import read_chunks
+
+        return cls(read_chunks(path, size, mmap))
+
     def iterate(cls, seed: T, operation: Callable[[T], T]) -> Stream[T]:
         def generator(seed: T, operation: Callable[[T], T]) -> Iterator[T]:
             acc = seed
@@ -122,10 +173,135 @@ class __StrictClassMethodOfStream(type):
         return cls(generator(seed, operation))
 
 
+_Stage = tuple[Any, ...]
+_ELEMENTWISE = frozenset(("map", "filter", "filterfalse"))
+
+
+def _apply_stages(stages: tuple[_Stage, ...], ele: Any) -> tuple[Any, ...]:
+    """Runs fused element-wise stages on a single element, used by parallel plans."""
+    for kind, operation in stages:
+        if kind == "map":
+            ele = operation(ele)
+        elif kind == "filter":
+            if not operation(ele):
+                return ()
+        elif operation(ele):  # filterfalse
+            return ()
+    return (ele,)
+
+
+def _optimize_plan(plan: list[_Stage]) -> list[_Stage]:
+    """
+    Rewrites a recorded plan:
+    consecutive limits are merged,
+    limits are moved ahead of maps (which neither drop nor reorder elements),
+    and `sorted` followed by a limit becomes a bounded heap selection.
+    """
+    optimized: list[_Stage] = []
+    for stage in plan:
+        if stage[0] != "limit":
+            optimized.append(stage)
+        else:
+            k, maps = stage[1], []
+            while optimized and optimized[-1][0] == "map":
+                maps.append(optimized.pop())
+            if optimized and optimized[-1][0] in ("limit", "top_k"):
+                _, k0, *key_reverse = optimized.pop()
+                optimized.append(
+                    ("top_k", min(k, k0), *key_reverse)
+                    if key_reverse
+                    else ("limit", min(k, k0))
+                )
+            elif optimized and optimized[-1][0] == "sorted":
+                _, key, reverse = optimized.pop()
+                optimized.append(("top_k", k, key, reverse))
+            else:
+                optimized.append(("limit", k))
+            optimized.extend(reversed(maps))
+    return optimized
+
+
+def _compile_plan(
+    iterable: Iterable[Any],
+    plan: list[_Stage],
+    options: parallel.Options | None,
+    on_stage: Callable[[str, Iterator[Any], float], Iterator[Any]] | None = None,
+) -> Iterator[Any]:
+    """
+    Builds the iterator of an optimized plan.
+
+    Sequential element-wise runs stay nested builtin `map`/`filter`,
+    which measure faster in CPython than a fused python loop.
+    In parallel mode a whole run is fused into one task per element instead,
+    so each element is dispatched to the pool once rather than once per stage.
+
+    `on_stage`, if given, is called with the name, the iterator and the build time
+    of every compiled stage, and returns the iterator that the next stage consumes.
+    """
+    it = iter(iterable)
+    for is_elementwise, group in itertools.groupby(
+        _optimize_plan(plan), lambda stage: stage[0] in _ELEMENTWISE
+    ):
+        if is_elementwise and options is not None:
+            stages = tuple(group)
+            started = perf_counter()
+            it = parallel.iflatmap(partial(_apply_stages, stages), it, *options)
+            if on_stage is not None:
+                name = "+".join(kind for kind, _ in stages)
+                it = on_stage(name, it, perf_counter() - started)
+            continue
+        for kind, *args in group:
+            started = perf_counter()
+            if kind == "map":
+                it = map(args[0], it)
+            elif kind == "filter":
+                it = filter(args[0], it)
+            elif kind == "filterfalse":
+                it = itertools.filterfalse(args[0], it)
+            elif kind == "limit":
+                it = itertools.islice(it, args[0])
+            elif kind == "sorted":
+                it = iter(sorted(it, key=args[0], reverse=args[1]))
+            else:  # top_k
+                k, key, reverse = args
+                it = iter(
+                    (heapq.nlargest if reverse else heapq.nsmallest)(k, it, key=key)
+                )
+            if on_stage is not None:
+                it = on_stage(kind, it, perf_counter() - started)
+    return it
+
+
 @final
 class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
     def __init__(self, iterable: Iterable[T] = ()) -> None:
-        self.__iterable = iter(iterable)
+        self.__source = iter(iterable)
+        self.__parallel: parallel.Options | None = None
+        self.__plan: list[_Stage] | None = None
+        self.__stage: profiling.StageStats | None = None
+
+    @property
+    def __iterable(self) -> Iterator[T]:
+        """
+        The upstream iterator, compiling pending stages of a deferred stream.
+        Under a `stream_profiler`, it also starts timing the stage being built.
+        """
+        if self.__stage is None and profiling.enabled:
+            profiler = profiling.active()
+            if profiler is not None:
+                self.__stage = profiler.new_stage("source", None)
+                self.__source = profiling.ProfiledIterator(self.__source, self.__stage)
+        if self.__plan:
+            self.__source = _compile_plan(
+                self.__source,
+                self.__plan,
+                self.__parallel,
+                None if self.__stage is None else self.__profile_planned,
+            )
+            self.__plan = []
+        if self.__stage is not None:
+            self.__stage.downstream_started = perf_counter()
+        return self.__source
 
     def __iter__(self) -> Iterator[T]:
         return self.__iterable
@@ -133,33 +309,193 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
     def __str__(self) -> str:
         return f"<Stream object at {hex(id(self))}>"
 
+    def __derive(self, iterable: Iterable[U1], name: str | None) -> Stream[U1]:
+        """
+        Wraps the next stage, keeping the execution mode of this stream.
+        Under a `stream_profiler`, the stage is reported as `name`,
+        or counted as part of this one if `name` is None.
+        """
+        stream = Stream(iterable)
+        stream.__parallel = self.__parallel
+        stream.__plan = None if self.__plan is None else []
+        stage = self.__stage
+        if stage is not None:
+            if name is None:
+                stream.__stage = stage
+            else:
+                stream.__stage = stage.profiler.new_stage(
+                    name, stage, perf_counter() - stage.downstream_started
+                )
+                stream.__stage.observe_buffer()
+                stream.__source = profiling.ProfiledIterator(
+                    stream.__source, stream.__stage
+                )
+        return stream
+
+    def __profile_planned(
+        self, name: str, iterator: Iterator[Any], construct_time: float
+    ) -> Iterator[Any]:
+        """Reports a stage compiled from the plan, see `__derive`."""
+        self.__stage = self.__stage.profiler.new_stage(  # pyright: ignore [reportOptionalMemberAccess]
+            name, self.__stage, construct_time
+        )
+        self.__stage.observe_buffer()
+        return profiling.ProfiledIterator(iterator, self.__stage)
+
+    def __record(self, *stage: Any) -> Stream[Any]:
+        """Appends a stage to the plan of a deferred stream without running it."""
+        stream = Stream(self.__source)
+        stream.__parallel = self.__parallel
+        stream.__plan = [
+            *self.__plan,  # pyright: ignore [reportOptionalIterable]
+            stage,
+        ]
+        stream.__stage = self.__stage
+        return stream
+
+    def deferred(self) -> Stream[T]:
+        """
+        Records later `map`, `filter`, `filterfalse`, `limit`, `take_first`,
+        `sorted` and `top_k` stages as a plan, which is optimized and run
+        once any other operation needs the elements.
+
+        The optimizer merges consecutive limits, moves limits ahead of maps,
+        turns `sorted` followed by a limit into a heap-based top-k selection
+        and, in parallel mode, fuses element-wise stages into a single task.
+
+        Example:
+            >>> Stream([5, 1, 4, 2]).deferred().sorted().map(str).take_first(2).to_list()
+            ['1', '2']
+        """
+        stream = self.__derive(self.__iterable, None)
+        stream.__plan = []
+        return stream
+
+    def parallel(
+        self,
+        workers: int | None = None,
+        executor: parallel.ExecutorKind = "thread",
+        ordered: bool = True,
+        chunksize: int = 1,
+    ) -> Stream[T]:
+        """
+        Runs the callables of later `map`, `filter`, `flatmap` and `for_each`
+        in a thread or process pool, other stages stay sequential.
+
+        The input is submitted in chunks and only `2 * workers` of them
+        are in flight at once, so memory stays bounded.
+
+        Parameters:
+            `workers`: Size of the pool, defaults to the number of CPUs.
+            `executor`: `"thread"` for I/O-bound work, `"process"` for CPU-bound work,
+                callables must be picklable for the latter.
+            `ordered`: Whether to keep the input order or yield results as they finish.
+            `chunksize`: Number of elements sent to a worker at once.
+
+        Example:
+            >>> Stream.range(5).parallel(workers=2).map(lambda x: x * x).to_list()
+            [0, 1, 4, 9, 16]
+        """
+        parallel.check_options(workers, executor, chunksize)
+        stream = self.__derive(self.__iterable, None)
+        stream.__parallel = parallel.Options(workers, executor, ordered, chunksize)
+        return stream
+
+    def sequential(self) -> Stream[T]:
+        """Turns off the parallel mode set by `parallel`."""
+        stream = self.__derive(self.__iterable, None)
+        stream.__parallel = None
+        return stream
+
+    def prefetch(self, n: int = 1) -> Stream[T]:
+        """
+        Reads up to `n` elements ahead in a background thread,
+        so I/O latency upstream (listing, `stat`, subprocess reads)
+        overlaps with the work done downstream.
+
+        Example:
+            >>> Stream(Path(".").iterdir()).map(lambda p: (p, p.stat())).prefetch(64)
+        """
+        return self.__derive(parallel.prefetch(self.__iterable, n), "prefetch")
+
+    def pipeline(
+        self,
+        operation: Callable[[T], U1],
+        workers: int = 1,
+        queue_size: int = 16,
+        ordered: bool = True,
+    ) -> Stream[U1]:
+        """
+        Maps with `operation` in a stage running in `workers` threads of its own.
+
+        Unlike `parallel`, every `pipeline` stage gets its own worker count,
+        and stages are connected by bounded queues of `queue_size` elements,
+        so a subprocess-bound stage and a CPU-bound one run at the same time
+        while memory stays bounded.
+
+        Example:
+            >>> (
+            ...     Stream(videos)
+            ...     .pipeline(lambda v: (v, get_file_id(v)), workers=2)
+            ...     .pipeline(lambda p: gen_thumb(p[0], f"{p[1]}.jpg"), workers=4)
+            ...     .for_each(print)
+            ... )
+        """
+        return self.__derive(
+            parallel.pipeline(operation, self.__iterable, workers, queue_size, ordered),
+            "pipeline",
+        )
+
     def cycle(self) -> Stream[T]:
-        return Stream(itertools.cycle(self.__iterable))
+        return self.__derive(itertools.cycle(self.__iterable), "cycle")
 
     def accumulate(self) -> Stream[T]:
-        return Stream(itertools.accumulate(self.__iterable))
+        return self.__derive(itertools.accumulate(self.__iterable), "accumulate")
 
     # Wait python 3.12 release on Arch
     # def batched(self, n: int) -> Stream[T]:
-    #     return Stream(itertools.batched(self.__iterable, n))
+    #     return self.__derive(itertools.batched(self.__iterable, n))
 
     def map(self, operation: Callable[[T], U1]) -> Stream[U1]:
-        return Stream(map(operation, self.__iterable))
+        if self.__plan is not None:
+            return self.__record("map", operation)
+        return self.__derive(
+            (
+                map(operation, self.__iterable)
+                if self.__parallel is None
+                else parallel.imap(operation, self.__iterable, *self.__parallel)
+            ),
+            "map",
+        )
 
     def starmap(
         self, operation: Callable[[T, ...], U1]  # pyright: ignore
     ) -> Stream[U1]:  # Iterable[tuple[T, ...]] -> Stream[U]
-        return Stream(
+        return self.__derive(
             itertools.starmap(
                 operation, self.__iterable  # pyright: ignore [reportArgumentType]
-            )
+            ),
+            "starmap",
         )
 
     def filter(self, predicate: Callable[[T], bool]) -> Stream[T]:
-        return Stream(filter(predicate, self.__iterable))
+        if self.__plan is not None:
+            return self.__record("filter", predicate)
+        return self.__derive(
+            (
+                filter(predicate, self.__iterable)
+                if self.__parallel is None
+                else parallel.ifilter(predicate, self.__iterable, *self.__parallel)
+            ),
+            "filter",
+        )
 
     def filterfalse(self, predicate: Callable[[T], bool]) -> Stream[T]:
-        return Stream(itertools.filterfalse(predicate, self.__iterable))
+        if self.__plan is not None:
+            return self.__record("filterfalse", predicate)
+        return self.__derive(
+            itertools.filterfalse(predicate, self.__iterable), "filterfalse"
+        )
 
     @overload
     def reduce(self, operation: Callable[[T, T], T]) -> T: ...
@@ -188,6 +524,40 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
             *((init,) if init is not _MissingDefault else ()),
         )
 
+    def parallel_reduce(
+        self,
+        operation: Callable[[Any, T], Any],
+        combine: Callable[[Any, Any], Any] | None = None,
+        init: Any = _MissingDefault,
+        chunksize: int = 1024,
+        workers: int | None = None,
+        executor: parallel.ExecutorKind = "process",
+    ) -> Any:
+        """
+        Reduces chunks of `chunksize` elements in a pool,
+        then merges the partial results pairwise with `combine`.
+
+        Parameters:
+            `operation`: Folds an element into an accumulator,
+                it must be associative and picklable for the `"process"` executor.
+            `combine`: Merges two accumulators, defaults to `operation`.
+            `init`: The initial accumulator of every chunk,
+                it must be an identity of `combine`.
+
+        Example:
+            >>> Stream.range(10_000).parallel_reduce(operator.add)
+            49995000
+        """
+        return parallel.reduce(
+            operation,
+            self.__iterable,
+            combine,
+            () if init is _MissingDefault else (init,),
+            workers,
+            executor,
+            chunksize,
+        )
+
     @overload
     def group_by(self, key: None = None) -> Stream[tuple[T, Stream[T]]]: ...
     @overload
@@ -195,11 +565,12 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
     def group_by(
         self, key: Callable[[T], U1] | None = None
     ) -> Stream[tuple[U1, Stream[T]]] | Stream[tuple[T, Stream[T]]]:
-        return Stream(
+        return self.__derive(
             map(
                 lambda pair: (pair[0], Stream(pair[1])),
                 itertools.groupby(self.__iterable, key),
-            )  # pyright: ignore [reportReturnType]
+            ),  # pyright: ignore [reportReturnType]
+            "group_by",
         )
 
     @overload
@@ -218,7 +589,10 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
         return (  # pyright: ignore [reportReturnType]
             iters.partition(predicate, self.__iterable, lazy)
             if not lazy
-            else tuple(map(Stream, iters.partition(predicate, self.__iterable, lazy)))
+            else tuple(
+                self.__derive(it, "partition")
+                for it in iters.partition(predicate, self.__iterable, lazy)
+            )
         )
 
     @overload
@@ -232,7 +606,7 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
     def zip(  # pyright: ignore [reportInconsistentOverload]
         self, *iterables: Iterable[T], strict: bool = False
     ) -> Stream[tuple[T, ...]]:
-        return Stream(zip(self.__iterable, *iterables, strict=strict))
+        return self.__derive(zip(self.__iterable, *iterables, strict=strict), "zip")
 
     @overload
     def zip_longest(
@@ -245,18 +619,20 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
     def zip_longest(  # pyright: ignore [reportInconsistentOverload]
         self, *iterables: Iterable[T], fillvalue: Any = None
     ) -> Stream[tuple[T, ...]]:
-        return Stream(itertools.zip_longest(self.__iterable, *iterables, fillvalue))
+        return self.__derive(
+            itertools.zip_longest(self.__iterable, *iterables, fillvalue), "zip_longest"
+        )
 
     def enumerate(self, start: int = 0) -> Stream[tuple[int, T]]:
-        return Stream(enumerate(self.__iterable, start=start))
+        return self.__derive(enumerate(self.__iterable, start=start), "enumerate")
 
     def concat(
         self, *iterables: Iterable[T]
     ) -> Stream[T]:  # tuple[Iterable[T], ...] -> Stream[T]
-        return Stream(itertools.chain(self.__iterable, *iterables))
+        return self.__derive(itertools.chain(self.__iterable, *iterables), "concat")
 
     def pre_concat(self, *iterables: Iterable[T]) -> Stream[T]:
-        return Stream(itertools.chain(*iterables, self.__iterable))
+        return self.__derive(itertools.chain(*iterables, self.__iterable), "pre_concat")
 
     # Hack: this is a workaround for covariant
     # No idea how to extract `T` from `U = Iterable[T]`
@@ -292,7 +668,7 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
     def flatten(  # pyright: ignore [reportInconsistentOverload]
         self: Stream[Iterable[U1]],
     ) -> Stream[U1]:
-        return Stream(itertools.chain.from_iterable(self.__iterable))
+        return self.__derive(itertools.chain.from_iterable(self.__iterable), "flatten")
 
     def flatmap(self, operation: Callable[[T], Iterable[U1]]) -> Stream[U1]:
         """
@@ -304,42 +680,64 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
         Returns:
             A new stream over the flattened and transformed stream.
         """
-        return Stream(iters.flatmap(operation, self.__iterable))
+        return self.__derive(
+            (
+                iters.flatmap(operation, self.__iterable)
+                if self.__parallel is None
+                else parallel.iflatmap(operation, self.__iterable, *self.__parallel)
+            ),
+            "flatmap",
+        )
 
     def compress(self, selectors: Iterable[T]) -> Stream[T]:
-        return Stream(itertools.compress(self.__iterable, selectors))
+        return self.__derive(itertools.compress(self.__iterable, selectors), "compress")
 
     def product(
         self, *iterables: Iterable[T], repeat: int = 1
     ) -> Stream[tuple[T, ...]]:
-        return Stream(itertools.product(self.__iterable, *iterables, repeat=repeat))
+        return self.__derive(
+            itertools.product(self.__iterable, *iterables, repeat=repeat), "product"
+        )
 
     def permutations(self, r: int | None = None) -> Stream[tuple[T, ...]]:
-        return Stream(itertools.permutations(self.__iterable, r=r))
+        return self.__derive(
+            itertools.permutations(self.__iterable, r=r), "permutations"
+        )
 
     def combinations(self, r: int) -> Stream[tuple[T, ...]]:
-        return Stream(itertools.combinations(self.__iterable, r=r))
+        return self.__derive(
+            itertools.combinations(self.__iterable, r=r), "combinations"
+        )
 
     def combinations_with_replacement(self, r: int) -> Stream[tuple[T, ...]]:
-        return Stream(itertools.combinations_with_replacement(self.__iterable, r=r))
+        return self.__derive(
+            itertools.combinations_with_replacement(self.__iterable, r=r),
+            "combinations_with_replacement",
+        )
 
     def limit(self, max_size: int) -> Stream[T]:
         """
         Returns a new stream consisting of same elements as original,
         truncated to be no longer than `k` in length.
         """
-        return Stream(itertools.islice(self.__iterable, max_size))
+        if self.__plan is not None:
+            if max_size < 0:
+                raise ValueError("'max_size' must be greater than or equal to zero")
+            return self.__record("limit", max_size)
+        return self.__derive(itertools.islice(self.__iterable, max_size), "limit")
 
     def drop_first(self, k: int = 1) -> Stream[T]:
         """Like `list[k:]` or `itertools.islice(seq, k, None)`, but more time-efficient"""
-        return Stream(iters.drop_first(self.__iterable, k))
+        return self.__derive(iters.drop_first(self.__iterable, k), "drop_first")
 
     def take_first(self, k: int = 1) -> Stream[T]:
         """An alias for `itertools.islice(seq, k)`"""
         if k < 0:
             raise ValueError("'k' must be greater than or equal to zero")
+        elif self.__plan is not None:
+            return self.__record("limit", k)
         else:
-            return Stream(itertools.islice(self.__iterable, k))
+            return self.__derive(itertools.islice(self.__iterable, k), "take_first")
 
     def drop_last(self, k: int = 1) -> Stream[T]:
         """
@@ -364,7 +762,7 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
             if k < 0:
                 raise ValueError("'k' must be greater than or equal to zero")
             elif k == 0:
-                return iter(iterable)
+                yield from iterable
             else:
                 it, window = iter(iterable), deque(maxlen=k)
                 try:
@@ -376,7 +774,7 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
                 except StopIteration:
                     return iter(())
 
-        return Stream(generator(self.__iterable, k))
+        return self.__derive(generator(self.__iterable, k), "drop_last")
 
     def take_last(self, k: int = 1) -> Stream[T]:
         """
@@ -399,18 +797,24 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
         if k < 0:
             raise ValueError("'k' must be greater than or equal to zero")
         elif k == 0:
-            return Stream()  # pyright: ignore [reportReturnType]
+            return self.__derive((), "take_last")
         else:
-            return Stream(deque(self.__iterable, maxlen=k))
+            return self.__derive(deque(self.__iterable, maxlen=k), "take_last")
 
     def take_while(self, predicate: Callable[[T], bool]) -> Stream[T]:
-        return Stream(itertools.takewhile(predicate, self.__iterable))
+        return self.__derive(
+            itertools.takewhile(predicate, self.__iterable), "take_while"
+        )
 
     def drop_while(self, predicate: Callable[[T], bool]) -> Stream[T]:
-        return Stream(itertools.dropwhile(predicate, self.__iterable))
+        return self.__derive(
+            itertools.dropwhile(predicate, self.__iterable), "drop_while"
+        )
 
     def tee(self, n: int = 2) -> tuple[Stream[T], ...]:
-        return tuple(map(Stream, itertools.tee(self.__iterable, n)))
+        return tuple(
+            self.__derive(it, "tee") for it in itertools.tee(self.__iterable, n)
+        )
 
     @overload
     def slice(self, __stop: int) -> Stream[T]: ...
@@ -422,10 +826,12 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
     def slice(
         self, __start: int, __stop: int | None = None, step: int = 1
     ) -> Stream[T]:
-        return Stream(itertools.islice(self.__iterable, __start, __stop, step))
+        return self.__derive(
+            itertools.islice(self.__iterable, __start, __stop, step), "slice"
+        )
 
     def pairwise(self) -> Stream[tuple[T, ...]]:
-        return Stream(itertools.pairwise(self.__iterable))
+        return self.__derive(itertools.pairwise(self.__iterable), "pairwise")
 
     def nwise(self, n: int = 2) -> Stream[tuple[T, ...]]:
         """
@@ -450,7 +856,7 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
                 iterators = itertools.tee(iterable, n)
                 for i, it in enumerate(iterators):
                     deque(zip(itertools.repeat(None, i), it), maxlen=0)
-                return zip(*iterators)
+                yield from zip(*iterators)
             else:
                 it = iter(iterable)
                 window = deque(itertools.islice(it, n - 1), maxlen=n)
@@ -458,7 +864,7 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
                     window.append(ele)
                     yield tuple(window)
 
-        return Stream(generator(self.__iterable, n))
+        return self.__derive(generator(self.__iterable, n), "nwise")
 
     def peek(self, operation: Callable[[T], None]) -> Stream[T]:
         def generator(
@@ -468,34 +874,155 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
                 operation(ele)
                 yield ele
 
-        return Stream(generator(operation, self.__iterable))
+        return self.__derive(generator(operation, self.__iterable), "peek")
 
     @overload
     def sorted(
-        self: Stream[C], key: None = None, reverse: bool = False
+        self: Stream[C],
+        key: None = None,
+        reverse: bool = False,
+        limit: int | None = None,
     ) -> Stream[T]: ...
     @overload
-    def sorted(self, key: Callable[[T], C], reverse: bool = False) -> Stream[T]: ...
+    def sorted(
+        self,
+        key: Callable[[T], C],
+        reverse: bool = False,
+        limit: int | None = None,
+    ) -> Stream[T]: ...
 
     def sorted(
         self,
         key: Callable[[T], C] | None = None,
         reverse: bool = False,
+        limit: int | None = None,
     ) -> Stream[T]:
-        return Stream(
-            sorted(
-                self.__iterable,
-                key=key,  # pyright: ignore [reportCallIssue,reportArgumentType]
-                reverse=reverse,
+        """
+        Sorts the stream, use `limit` to keep only the first `limit` elements
+        in O(n log k) time and O(k) memory instead of sorting everything.
+        """
+        if limit is not None:
+            return self.top_k(
+                limit, key, reverse  # pyright: ignore [reportArgumentType]
+            )
+        elif self.__plan is not None:
+            return self.__record("sorted", key, reverse)
+        else:
+            return self.__derive(
+                sorted(
+                    self.__iterable,
+                    key=key,  # pyright: ignore [reportCallIssue,reportArgumentType]
+                    reverse=reverse,
+                ),
+                "sorted",
+            )
+
+    @overload
+    def top_k(
+        self: Stream[C], k: int, key: None = None, reverse: bool = False
+    ) -> Stream[T]: ...
+    @overload
+    def top_k(
+        self, k: int, key: Callable[[T], C], reverse: bool = False
+    ) -> Stream[T]: ...
+
+    def top_k(
+        self,
+        k: int,
+        key: Callable[[T], C] | None = None,
+        reverse: bool = False,
+    ) -> Stream[T]:
+        """
+        Same as `sorted(key, reverse).take_first(k)`,
+        but only a heap of `k` elements is kept while consuming the stream.
+
+        Raises:
+            `ValueError`: If `k` is negative.
+
+        Example:
+            >>> Stream([3, 1, 4, 1, 5, 9, 2, 6]).top_k(3, reverse=True).to_list()
+            [9, 6, 5]
+        """
+        if k < 0:
+            raise ValueError("'k' must be greater than or equal to zero")
+        elif self.__plan is not None:
+            return self.__record("top_k", k, key, reverse)
+        else:
+            return self.__derive(
+                (heapq.nlargest if reverse else heapq.nsmallest)(
+                    k,
+                    self.__iterable,
+                    key=key,  # pyright: ignore [reportCallIssue,reportArgumentType]
+                ),
+                "top_k",
             )
+
+    def nsmallest(self, k: int, key: Callable[[T], C] | None = None) -> Stream[T]:
+        """An alias for `top_k(k, key)`"""
+        return self.top_k(k, key)  # pyright: ignore [reportArgumentType]
+
+    def nlargest(self, k: int, key: Callable[[T], C] | None = None) -> Stream[T]:
+        """An alias for `top_k(k, key, reverse=True)`"""
+        return self.top_k(k, key, reverse=True)  # pyright: ignore [reportArgumentType]
+
+    def external_sorted(
+        self,
+        key: Callable[[T], Any] | None = None,
+        reverse: bool = False,
+        run_size: int = 1 << 20,
+        encoding: str | None = None,
+        tmp_dir: str | None = None,
+    ) -> Stream[T]:
+        """
+        Like `sorted`, but sorted runs of `run_size` elements are spilled to
+        temporary files and merged lazily, so the input may exceed the memory.
+        See `iters.external_sorted` for the parameters.
+        """
+        return self.__derive(
+            iters.external_sorted(  # pyright: ignore [reportCallIssue]
+                self.__iterable,
+                key,  # pyright: ignore [reportArgumentType]
+                reverse,
+                run_size,
+                encoding,
+                tmp_dir,
+            ),
+            "external_sorted",
         )
 
     @overload
-    def unique_everseen(self: Stream[H], key: None = None) -> Stream[T]: ...
+    def unique_everseen(
+        self: Stream[H],
+        key: None = None,
+        approx: bool = False,
+        capacity: int = 1 << 20,
+        error_rate: float = 0.01,
+    ) -> Stream[T]: ...
     @overload
-    def unique_everseen(self, key: Callable[[T], H]) -> Stream[T]: ...
+    def unique_everseen(
+        self,
+        key: Callable[[T], H],
+        approx: bool = False,
+        capacity: int = 1 << 20,
+        error_rate: float = 0.01,
+    ) -> Stream[T]: ...
+
+    def unique_everseen(
+        self,
+        key: Callable[[T], H] | None = None,
+        approx: bool = False,
+        capacity: int = 1 << 20,
+        error_rate: float = 0.01,
+    ) -> Stream[T]:
+        """
+        Yields elements whose key hasn't been seen before.
+
+        By default every seen key is kept in a `set`.
+        With `approx`, a Bloom filter of fixed size is used instead,
+        it's sized for `capacity` distinct keys at `error_rate`,
+        and a false positive drops a unique element.
+        """
 
-    def unique_everseen(self, key: Callable[[T], H] | None = None) -> Stream[T]:
         def generator(
             iterable: Iterable[T], key: Callable[[T], H] | None = None
         ) -> Iterator[T]:
@@ -512,21 +1039,54 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
                     visited.add(k)  # pyright: ignore [reportArgumentType]
                     yield ele
 
-        return Stream(generator(self.__iterable, key=key))
+        def approx_generator(
+            iterable: Iterable[T], bloom: sketch.BloomFilter
+        ) -> Iterator[T]:
+            for ele in iterable:
+                if bloom.add(ele if key is None else key(ele)):
+                    yield ele
+
+        return self.__derive(
+            (
+                approx_generator(
+                    self.__iterable, sketch.BloomFilter(capacity, error_rate)
+                )
+                if approx
+                else generator(self.__iterable, key=key)
+            ),
+            "unique_everseen",
+        )
+
+    def approx_count_distinct(self, precision: int = 14) -> int:
+        """
+        Estimates the number of distinct elements with a HyperLogLog
+        of `2 ** precision` bytes, the standard error is `1.04 / sqrt(2 ** precision)`.
+        """
+        hll = sketch.HyperLogLog(precision)
+        iters.for_each(hll.add, self.__iterable)
+        return len(hll)
 
     def unique_justseen(self, key: Callable[[T], Any] | None = None) -> Stream[T]:
-        return Stream(
-            map(
-                next,
-                map(operator.itemgetter(1), itertools.groupby(self.__iterable, key)),
-            )
-            if key is not None
-            else map(operator.itemgetter(0), itertools.groupby(self.__iterable))
+        return self.__derive(
+            (
+                map(
+                    next,
+                    map(
+                        operator.itemgetter(1), itertools.groupby(self.__iterable, key)
+                    ),
+                )
+                if key is not None
+                else map(operator.itemgetter(0), itertools.groupby(self.__iterable))
+            ),
+            "unique_justseen",
         )
 
     def for_each(self, operation: Callable[[T], Any]) -> None:
         """Like `map`, but doesn't construct an iterator."""
-        iters.for_each(operation, self.__iterable)
+        if self.__parallel is None:
+            iters.for_each(operation, self.__iterable)
+        else:
+            parallel.for_each(operation, self.__iterable, *self.__parallel)
 
     def star_foreach(
         self, operation: Callable[[T, ...], Any]  # pyright: ignore
@@ -621,11 +1181,98 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
                 "No values in the iterable satisfy the predicate"
             )
 
+    def aggregate_by(
+        self,
+        key: Callable[[T], H],
+        reducer: reducers.ReducerLike | Mapping[str, reducers.ReducerLike],
+    ) -> dict[H, Any]:
+        """
+        Groups elements by `key` and folds each group in a single pass,
+        the stream doesn't need to be sorted unlike `group_by`.
+
+        Parameters:
+            `key`: A function computing the group of each element.
+            `reducer`: A `reducers.Reducer`, the name of a builtin one
+                (count, sum, min, max, mean, first, last),
+                or a mapping from names to either of them.
+
+        Returns:
+            A dict from each key to the result of `reducer`,
+            or to a dict of results when `reducer` is a mapping.
+
+        Example:
+            >>> Stream(["a", "bb", "c"]).aggregate_by(len, "count")
+            {1: 2, 2: 1}
+        """
+        return reducers.aggregate_by(self.__iterable, key, reducer)
+
+    def collect_many(
+        self, collectors: Mapping[str, reducers.ReducerLike]
+    ) -> dict[str, Any]:
+        """
+        Feeds every element to several reducers in a single pass
+        and returns their results keyed by name.
+        Unlike `tee` or `partition`, nothing is buffered between the consumers.
+
+        Parameters:
+            `collectors`: A mapping from names to a `reducers.Reducer`,
+                the name of a builtin one, or a factory like `reducers.to_list`.
+
+        Example:
+            >>> Stream.range(5).collect_many({"n": "count", "sum": "sum", "all": "to_list"})
+            {'n': 5, 'sum': 10, 'all': [0, 1, 2, 3, 4]}
+        """
+        return reducers.collect_many(self.__iterable, collectors)
+
+    def sample(self, k: int, seed: int | None = None) -> Stream[T]:
+        """
+        Picks `k` random elements in a single pass with O(k) memory,
+        see `iters.sample`.
+        """
+        return self.__derive(iters.sample(self.__iterable, k, seed), "sample")
+
+    def sample_by(
+        self, key: Callable[[T], H], k_per_group: int, seed: int | None = None
+    ) -> dict[H, list[T]]:
+        """
+        Picks up to `k_per_group` random elements of each group in a single pass,
+        keeping O(groups * k_per_group) elements in memory.
+        """
+        return reducers.aggregate_by(
+            self.__iterable, key, reducers.sample(k_per_group, seed)
+        )
+
     def counter(self: Stream[H]) -> Counter[H]:
         return Counter(self.__iterable)
 
+    def heavy_hitters(self: Stream[H], k: int) -> list[tuple[H, int]]:
+        """
+        Finds up to `k` most frequent elements with the Space-Saving algorithm
+        in O(k) memory, unlike `counter` which counts every distinct element.
+
+        Returns:
+            Pairs of element and count, most common first.
+            Counts are upper bounds, and every element occurring more than
+            `n / k` times is included.
+        """
+        summary = sketch.SpaceSaving(k)
+        iters.for_each(summary.add, self.__iterable)
+        return summary.most_common()  # pyright: ignore [reportReturnType]
+
+    def count_min(self, width: int = 2048, depth: int = 5) -> sketch.CountMinSketch:
+        """
+        Counts elements into a Count-Min sketch of fixed size,
+        query the approximate count of an element by `sketch[element]`.
+        """
+        summary = sketch.CountMinSketch(width, depth)
+        iters.for_each(summary.add, self.__iterable)
+        return summary
+
     def repeated_elements(self: Stream[H]) -> Stream[H]:
-        return Stream(ele for ele, count in self.counter().items() if count > 1)
+        return self.__derive(
+            (ele for ele, count in self.counter().items() if count > 1),
+            "repeated_elements",
+        )
 
     def to_list(self) -> list[T]:
         return list(self.__iterable)
@@ -655,4 +1302,310 @@ class Stream(Generic[T], metaclass=__StrictClassMethodOfStream):
         return operation(self.__iterable)
 
     def collects(self, operation: Callable[[Iterable[T]], Iterable[U1]]) -> Stream[U1]:
-        return Stream(operation(self.__iterable))
+        return self.__derive(operation(self.__iterable), "collects")
+
+
+async def _resolve(value: U1 | Awaitable[U1]) -> U1:
+    return (
+        await value  # pyright: ignore [reportReturnType]
+        if isinstance(value, Awaitable)
+        else value
+    )
+
+
+@final
+class AsyncStream(Generic[T]):
+    """
+    An asyncio counterpart of `Stream` over an async (or plain) iterable.
+
+    Callables passed to its stages may be either plain or async functions.
+    Terminal operations are coroutines and must be awaited.
+
+    Example:
+        >>> asyncio.run(AsyncStream(range(5)).map(lambda x: x * 2).to_list())
+        [0, 2, 4, 6, 8]
+    """
+
+    def __init__(self, iterable: AsyncIterable[T] | Iterable[T] = ()) -> None:
+        async def generator(iterable: Iterable[T]) -> AsyncIterator[T]:
+            for ele in iterable:
+                yield ele
+
+        self.__iterable: AsyncIterator[T] = (
+            aiter(iterable)
+            if isinstance(iterable, AsyncIterable)
+            else generator(iterable)
+        )
+
+    def __aiter__(self) -> AsyncIterator[T]:
+        return self.__iterable
+
+    def __str__(self) -> str:
+        return f"<AsyncStream object at {hex(id(self))}>"
+
+    def map(self, operation: Callable[[T], U1 | Awaitable[U1]]) -> AsyncStream[U1]:
+        """Applies `operation` to each element, one at a time."""
+
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[U1]:
+            async for ele in iterable:
+                yield await _resolve(operation(ele))
+
+        return AsyncStream(generator(self.__iterable))
+
+    def map_concurrent(
+        self,
+        operation: Callable[[T], Awaitable[U1]],
+        limit: int,
+        ordered: bool = True,
+    ) -> AsyncStream[U1]:
+        """
+        Like `map`, but keeps up to `limit` awaitables of `operation` in flight.
+
+        The upstream is only pulled when a slot is free,
+        so results are produced before the whole input has been consumed.
+
+        Parameters:
+            `operation`: An async function applied to each element.
+            `limit`: Maximum number of pending awaitables.
+            `ordered`: Whether to keep the input order or yield results as they finish.
+
+        Raises:
+            `ValueError`: If `limit` is less than 1.
+        """
+        if limit < 1:
+            raise ValueError("'limit' must be at least 1")
+
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[U1]:
+            import asyncio
+
+            queue: deque[asyncio.Future[U1]] = deque()
+            pending: set[asyncio.Future[U1]] = set()
+            try:
+                async for ele in iterable:
+                    if ordered:
+                        if len(queue) >= limit:
+                            yield await queue.popleft()
+                        queue.append(asyncio.ensure_future(operation(ele)))
+                    else:
+                        if len(pending) >= limit:
+                            done, pending = await asyncio.wait(
+                                pending, return_when=asyncio.FIRST_COMPLETED
+                            )
+                            for task in done:
+                                yield task.result()
+                        pending.add(asyncio.ensure_future(operation(ele)))
+                while queue:
+                    yield await queue.popleft()
+                for task in asyncio.as_completed(pending):
+                    yield await task
+            finally:
+                for task in itertools.chain(queue, pending):
+                    task.cancel()
+
+        return AsyncStream(generator(self.__iterable))
+
+    def filter(
+        self, predicate: Callable[[T], bool | Awaitable[bool]]
+    ) -> AsyncStream[T]:
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+            async for ele in iterable:
+                if await _resolve(predicate(ele)):
+                    yield ele
+
+        return AsyncStream(generator(self.__iterable))
+
+    def filterfalse(
+        self, predicate: Callable[[T], bool | Awaitable[bool]]
+    ) -> AsyncStream[T]:
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+            async for ele in iterable:
+                if not await _resolve(predicate(ele)):
+                    yield ele
+
+        return AsyncStream(generator(self.__iterable))
+
+    def flatmap(
+        self,
+        operation: Callable[
+            [T], Iterable[U1] | AsyncIterable[U1] | Awaitable[Iterable[U1]]
+        ],
+    ) -> AsyncStream[U1]:
+        """
+        Applies a function to each element in the stream then flattens the result.
+
+        Parameters:
+            `operation`: A function returning a plain or async iterable,
+                it may also be an async function returning a plain iterable.
+
+        Returns:
+            A new stream over the flattened and transformed stream.
+        """
+
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[U1]:
+            async for ele in iterable:
+                inner = operation(ele)
+                if isinstance(inner, AsyncIterable):
+                    async for sub in inner:
+                        yield sub
+                else:
+                    for sub in await _resolve(inner):
+                        yield sub
+
+        return AsyncStream(generator(self.__iterable))
+
+    def enumerate(self, start: int = 0) -> AsyncStream[tuple[int, T]]:
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[tuple[int, T]]:
+            i = start
+            async for ele in iterable:
+                yield i, ele
+                i += 1
+
+        return AsyncStream(generator(self.__iterable))
+
+    def limit(self, max_size: int) -> AsyncStream[T]:
+        """
+        Returns a new stream consisting of same elements as original,
+        truncated to be no longer than `max_size` in length.
+        """
+        if max_size < 0:
+            raise ValueError("'max_size' must be greater than or equal to zero")
+
+        async def generator(iterable: AsyncIterator[T]) -> AsyncIterator[T]:
+            for _ in range(max_size):
+                try:
+                    yield await anext(iterable)
+                except StopAsyncIteration:
+                    return
+
+        return AsyncStream(generator(self.__iterable))
+
+    def take_first(self, k: int = 1) -> AsyncStream[T]:
+        """An alias for `limit`"""
+        return self.limit(k)
+
+    def drop_first(self, k: int = 1) -> AsyncStream[T]:
+        if k < 0:
+            raise ValueError("'k' must be greater than or equal to zero")
+
+        async def generator(iterable: AsyncIterator[T]) -> AsyncIterator[T]:
+            for _ in range(k):
+                try:
+                    await anext(iterable)
+                except StopAsyncIteration:
+                    return
+            async for ele in iterable:
+                yield ele
+
+        return AsyncStream(generator(self.__iterable))
+
+    def take_while(
+        self, predicate: Callable[[T], bool | Awaitable[bool]]
+    ) -> AsyncStream[T]:
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+            async for ele in iterable:
+                if await _resolve(predicate(ele)):
+                    yield ele
+                else:
+                    return
+
+        return AsyncStream(generator(self.__iterable))
+
+    def drop_while(
+        self, predicate: Callable[[T], bool | Awaitable[bool]]
+    ) -> AsyncStream[T]:
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+            dropping = True
+            async for ele in iterable:
+                if dropping and await _resolve(predicate(ele)):
+                    continue
+                dropping = False
+                yield ele
+
+        return AsyncStream(generator(self.__iterable))
+
+    def peek(self, operation: Callable[[T], None | Awaitable[None]]) -> AsyncStream[T]:
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+            async for ele in iterable:
+                await _resolve(operation(ele))
+                yield ele
+
+        return AsyncStream(generator(self.__iterable))
+
+    def unique_everseen(
+        self, key: Callable[[T], Hashable] | None = None
+    ) -> AsyncStream[T]:
+        async def generator(iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+            visited: set[Hashable] = set()
+            async for ele in iterable:
+                k = ele if key is None else key(ele)
+                if k not in visited:
+                    visited.add(k)  # pyright: ignore [reportArgumentType]
+                    yield ele
+
+        return AsyncStream(generator(self.__iterable))
+
+    async def for_each(self, operation: Callable[[T], Any]) -> None:
+        async for ele in self.__iterable:
+            await _resolve(operation(ele))
+
+    @overload
+    async def reduce(self, operation: Callable[[T, T], T | Awaitable[T]]) -> T: ...
+    @overload
+    async def reduce(
+        self, operation: Callable[[U1, T], U1 | Awaitable[U1]], init: U1
+    ) -> U1: ...
+
+    async def reduce(  # pyright: ignore [reportInconsistentOverload]
+        self,
+        operation: Callable[[U1, T], U1 | Awaitable[U1]],
+        init: U1 | _MissingDefault = _MissingDefault,
+    ) -> U1:
+        if init is _MissingDefault:
+            try:
+                acc = await anext(self.__iterable)
+            except StopAsyncIteration:
+                raise TypeError("reduce() of empty iterable with no initial value")
+        else:
+            acc = init
+        async for ele in self.__iterable:
+            acc = await _resolve(
+                operation(acc, ele)  # pyright: ignore [reportArgumentType]
+            )
+        return acc  # pyright: ignore [reportReturnType]
+
+    async def count(self) -> int:
+        counter = 0
+        async for _ in self.__iterable:
+            counter += 1
+        return counter
+
+    async def find(self, predicate: Callable[[T], bool | Awaitable[bool]]) -> T:
+        """
+        Finds the first element in the stream that satisfies the given predicate.
+
+        Raises:
+            NoSuchElementException: If no values in the stream satisfy the predicate.
+        """
+        async for ele in self.__iterable:
+            if await _resolve(predicate(ele)):
+                return ele
+        raise NoSuchElementException("No values in the iterable satisfy the predicate")
+
+    async def to_list(self) -> list[T]:
+        return [ele async for ele in self.__iterable]
+
+    async def to_tuple(self) -> tuple[T, ...]:
+        return tuple(await self.to_list())
+
+    async def to_set(self) -> set[T]:
+        return {ele async for ele in self.__iterable}
+
+    async def to_dict(self: AsyncStream[tuple[U1, U2]]) -> dict[U1, U2]:
+        return {k: v async for k, v in self.__iterable}
+
+    async def to_stream(self) -> Stream[T]:
+        """Drains this stream into a synchronous `Stream`."""
+        return Stream(await self.to_list())
+
+    async def collect(self, operation: Callable[[Iterable[T]], U1]) -> U1:
+        return operation(await self.to_list())